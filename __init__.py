@@ -1,5 +1,7 @@
 from imports import *
-from main.backtesting import Backtester, getPriceData, getLPAData, getProfitData
+from main.backtesting import Backtester, EventDrivenBacktester, ENGINE_VERSION, getDataWindow, getPriceData, getLPAData, getProfitData, getProvider, loadSelicData
+from main.cache import ResultCache, makeCacheKey
+from main.export import exportRun, loadRuns, defaultFormat
 
 Portfolio = [
     {'TICKER': 'ITUB3', 'WEIGHT': 90},
@@ -16,12 +18,17 @@ Portfolio = [
     {'TICKER': 'LREN3', 'WEIGHT': 65},
 ]
 
-def loadData(portfolio: pd.DataFrame) -> tuple:
+def loadData(portfolio: pd.DataFrame, config: Optional[dict] = None, maxWorkers: int = 1) -> tuple:
     """
     Load price, LPA, and profit data for all tickers
     
+    With a config, every source is only asked for the range the backtest
+    window needs (see getDataWindow) and SELIC is loaded for it too
+    
     Args:
         portfolio: DataFrame with tickers to load
+        config: Optional configuration dict bounding the fetched history
+        maxWorkers: Concurrent fetches (1 = sequential)
     
     Returns:
         (priceData, lpaData, profitData) as dicts
@@ -30,9 +37,20 @@ def loadData(portfolio: pd.DataFrame) -> tuple:
     print("LOADING DATA".center(70))
     print("="*70)
     
-    priceData = {t: getPriceData(t) for t in portfolio['TICKER']}
-    lpaData = {t: getLPAData(t) for t in portfolio['TICKER']}
-    profitData = {t: getProfitData(t) for t in portfolio['TICKER']}
+    tickers = portfolio['TICKER'].tolist()
+    window = getDataWindow(config) if config else {kind: (None, None) for kind in ('price', 'lpa', 'profit', 'selic')}
+    
+    with ThreadPoolExecutor(max_workers=maxWorkers) as pool:
+        prices = pool.map(lambda t: getPriceData(t, *window['price']), tickers)
+        lpas = pool.map(lambda t: getLPAData(t, *window['lpa']), tickers)
+        profits = pool.map(lambda t: getProfitData(t, *window['profit']), tickers)
+        
+        priceData = dict(zip(tickers, prices))
+        lpaData = dict(zip(tickers, lpas))
+        profitData = dict(zip(tickers, profits))
+    
+    if config:
+        loadSelicData(*window['selic'])
     
     return priceData, lpaData, profitData
 
@@ -42,7 +60,9 @@ def runBacktest(
     priceData: dict,
     lpaData: dict,
     profitData: dict,
-    useStrategy: bool = True
+    useStrategy: bool = True,
+    cache: Optional[ResultCache] = None,
+    engine: type = Backtester
 ) -> dict:
     """
     Execute single backtest
@@ -52,30 +72,68 @@ def runBacktest(
         portfolio: Portfolio DataFrame
         priceData, lpaData, profitData: Market data dicts
         useStrategy: If True, apply Graham's strategy; else Buy & Hold
+        cache: Optional ResultCache, identical runs are served from disk
+        engine: Backtester class, e.g. EventDrivenBacktester to skip quiet days
     
     Returns:
         Results dict from Backtester.getResults()
     """
-    bt = Backtester(config, portfolio, priceData, lpaData, profitData, useStrategy)
+    if cache is not None:
+        key = makeCacheKey(config, portfolio, priceData, lpaData, profitData, useStrategy, f'{ENGINE_VERSION}:{engine.__name__}')
+        results = cache.get(key)
+        if results is not None:
+            return results
+    
+    bt = engine(config, portfolio, priceData, lpaData, profitData, useStrategy)
     bt.backtest()
-    return bt.getResults()
+    results = bt.getResults()
+    
+    if cache is not None:
+        cache.put(key, results)
+    
+    return results
 
-def exportResults(resultsStrat: dict, resultsHold: dict) -> None:
-    """Export backtest results to CSV files"""
+def exportResults(
+    resultsStrat: dict,
+    resultsHold: dict,
+    config: Optional[dict] = None,
+    outputDir: str = 'results',
+    format: Optional[str] = None
+) -> None:
+    """
+    Export both backtests (equity, trades, dividends and run metadata)
+    
+    Runs are written to one dataset partitioned by run ID, read them back
+    with loadRuns(outputDir, table, columns=..., runIds=...)
+    
+    Args:
+        resultsStrat, resultsHold: Results dicts from runBacktest()
+        config: Configuration dict used for both runs
+        outputDir: Dataset root directory
+        format: 'parquet', 'arrow' or 'csv', defaults to Parquet when pyarrow
+                is installed and CSV otherwise
+    """
+    format = format or defaultFormat()
     ts = datetime.now().strftime('%Y%m%d_%H%M%S')
     
-    resultsStrat['equity_curve'].to_csv(f'equity_STRATEGY_{ts}.csv', index=False)
-    resultsHold['equity_curve'].to_csv(f'equity_BUYHOLD_{ts}.csv', index=False)
+    for name, results in (('STRATEGY', resultsStrat), ('BUYHOLD', resultsHold)):
+        exportRun(
+            results,
+            f'{ts}_{name}',
+            outputDir,
+            config=config,
+            metadata={'strategy': name, 'engine_version': ENGINE_VERSION},
+            format=format
+        )
 
 if __name__ == "__main__":
     #$ STOCKS_API connection test
-    start_time = time.time()
-    response = requests.get(f"http://{Config.STOCKS_API['HOST']}:{Config.STOCKS_API['PORT']}/health", timeout=5)
-    latency = (time.time() - start_time) * 1000
+    stocksApi = getProvider('profit')
+    statusCode, latency = stocksApi.health()
 
-    if response.status_code == 200:
-        print(f"Mansa (Stocks API) connected to http://{Config.STOCKS_API['HOST']}:{Config.STOCKS_API['PORT']}! ({latency:.2f}ms)")
-    else: print(f"Mansa (Stocks API) returned status {response.status_code}")
+    if statusCode == 200:
+        print(f"Mansa (Stocks API) connected to {stocksApi.baseUrl}! ({latency:.2f}ms)")
+    else: print(f"Mansa (Stocks API) returned status {statusCode}")
 
     config = {
         'SAFETY_MARGIN': 0.50,
@@ -85,14 +143,20 @@ if __name__ == "__main__":
     }
     
     portfolio = pd.DataFrame(Portfolio)
+    cache = ResultCache()
+    
+    # Decide the export format before spending time on the backtests
+    exportFormat = defaultFormat()
+    if exportFormat != 'parquet':
+        print("pyarrow not installed, results will be exported as CSV")
     
     # Load data
-    priceData, lpaData, profitData = loadData(portfolio)
+    priceData, lpaData, profitData = loadData(portfolio, config)
     
     # Run backtests
-    resultsStrat = runBacktest(config, portfolio, priceData, lpaData, profitData, useStrategy=True)
-    resultsHold = runBacktest(config, portfolio, priceData, lpaData, profitData, useStrategy=False)
+    resultsStrat = runBacktest(config, portfolio, priceData, lpaData, profitData, useStrategy=True, cache=cache)
+    resultsHold = runBacktest(config, portfolio, priceData, lpaData, profitData, useStrategy=False, cache=cache)
     
     # Compare and export
     if resultsStrat and resultsHold:
-        exportResults(resultsStrat, resultsHold)
\ No newline at end of file
+        exportResults(resultsStrat, resultsHold, config, format=exportFormat)
\ No newline at end of file
@@ -0,0 +1,57 @@
+import sys
+import os
+import json
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_TIME_BUDGET_MS = 600  # Backtest-only import path, cold interpreter (pandas + numpy dominate)
+RUNS = 5
+HEAVY_MODULES = ['yfinance', 'selenium', 'requests', 'tenacity']
+
+# Runs in a fresh interpreter so every measurement is a cold import
+PROBE = f"""
+import sys, time, json
+start = time.perf_counter()
+import main.backtesting
+elapsed = (time.perf_counter() - start) * 1000
+print(json.dumps({{'ms': elapsed, 'heavy': [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+def measureImportTime(runs: int = RUNS) -> dict:
+    """
+    Measure the import time of the backtest-only path (main.backtesting)
+
+    Args:
+        runs: Number of cold interpreter runs
+
+    Returns:
+        Dict with 'median_ms', 'max_ms' and 'heavy' (heavy modules loaded eagerly)
+    """
+    timings, heavy = [], set()
+
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', PROBE],
+            cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout
+        probe = json.loads(output.strip().splitlines()[-1])
+        timings.append(probe['ms'])
+        heavy.update(probe['heavy'])
+
+    return {
+        'median_ms': statistics.median(timings),
+        'max_ms': max(timings),
+        'heavy': sorted(heavy),
+    }
+
+if __name__ == "__main__":
+    result = measureImportTime()
+
+    print(f"Backtest import: median {result['median_ms']:.1f}ms | max {result['max_ms']:.1f}ms | budget {IMPORT_TIME_BUDGET_MS}ms")
+    if result['heavy']:
+        print(f"Heavy modules imported eagerly: {', '.join(result['heavy'])}")
+
+    if result['median_ms'] > IMPORT_TIME_BUDGET_MS or result['heavy']:
+        sys.exit(1)
@@ -0,0 +1,54 @@
+import sys
+import os
+import time
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pandas as pd
+
+from main.backtesting import loadSelicData
+from main.replay import ReplayServer, useReplay, useReplayServer, DEFAULT_FIXTURE_DIR
+
+WORKER_COUNTS = [1, 4, 8]
+
+def benchmarkLoading(portfolio: pd.DataFrame, workerCounts=WORKER_COUNTS) -> dict:
+    """
+    Time loadData() for each worker count against the active providers
+
+    Returns:
+        Dict mapping worker count -> seconds
+    """
+    from __init__ import loadData
+
+    timings = {}
+    for workers in workerCounts:
+        start = time.perf_counter()
+        loadData(portfolio, maxWorkers=workers)
+        loadSelicData()
+        timings[workers] = time.perf_counter() - start
+    return timings
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark data loading over recorded fixtures')
+    parser.add_argument('--dir', default=os.path.join(ROOT, DEFAULT_FIXTURE_DIR))
+    parser.add_argument('--latency', type=float, default=0.05, help='Delay per request (seconds)')
+    parser.add_argument('--http', action='store_true', help='Replay through the local HTTP stand-in')
+    args = parser.parse_args()
+
+    from __init__ import Portfolio
+    portfolio = pd.DataFrame(Portfolio)
+
+    if args.http:
+        with ReplayServer(args.dir, latency=args.latency) as server:
+            useReplayServer(server)
+            timings = benchmarkLoading(portfolio)
+    else:
+        useReplay(args.dir, latency=args.latency)
+        timings = benchmarkLoading(portfolio)
+
+    mode = 'HTTP stand-in' if args.http else 'in-process replay'
+    print(f'\n{mode}, {len(portfolio)} tickers, {args.latency * 1000:.0f}ms latency')
+    for workers, seconds in timings.items():
+        print(f'{workers:2} workers | {seconds:7.3f}s | {timings[WORKER_COUNTS[0]] / seconds:5.2f}x')
@@ -4,27 +4,18 @@ import json
 import time
 import threading
 import logging
+import hashlib
+import pickle
+import glob
 from typing import Optional, Tuple, List, Dict
 
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
 import pandas as pd
 import numpy as np
 
-import yfinance as yf
-
-import requests
-
-import selenium
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.wait import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-
-from tenacity import retry, stop_after_attempt, wait_exponential
-
 load_dotenv()
 class Config:
     STOCKS_API = {
@@ -3,87 +3,50 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from economics import *
+from portfolio import PortfolioTracker
+from providers import DataProvider, getProvider, setProvider
 from imports import *
 
 MIN_CASH_FOR_BUY = 10  # Minimum shares worth of cash needed to trigger buy
 PROGRESS_BAR_WIDTH = 40
 MIN_SHARES = 1
+SELIC_LOOKBACK_YEARS = 10  # getInterestRates averages SELIC over the previous 10 years
+SELIC_START_SLACK_DAYS = 31  # SELIC (series 4189) is monthly, its first row may follow the window start
+ENGINE_VERSION = '1.2.3'  # Bump whenever trading logic changes, invalidates cached results
 
-def setupSelenium():
-    options = webdriver.ChromeOptions()
-
-    options.add_argument('user-agent=Mozilla/5.0 (Macintosh; Intel Mac OS X 10_13) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/111.0.8191.896 Safari/537.36')
-    options.add_argument('--headless')
-    options.add_argument('--no-sandbox')
-    options.add_argument('--disable-dev-shm-usage')
-    options.add_argument('--disable-gpu')
-    options.add_argument('--disable-images')
-    options.add_argument('--blink-settings=imagesEnabled=false')
-
-    driver = webdriver.Chrome(
-        options=options,
-        service=Service(log_output=os.devnull),
-    )
-    driver.implicitly_wait(3)
-    return driver
-
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=1, max=3))
-def getPriceData(ticker):
-    df = yf.Ticker(f'{ticker}.SA').history(period='max').reset_index()
-    df['Date'] = pd.to_datetime(df['Date'].dt.strftime('%Y-%m-%d'))
-    return df
-
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=1, max=3))
-def getLPAData(ticker):
-    driver = setupSelenium()
-    driver.get(f'https://statusinvest.com.br/acoes/{ticker}')
-    
-    script = f"""
-    var callback = arguments[arguments.length - 1];
-    fetch('/acao/indicatorhistoricallist', {{
-        method: 'POST',
-        headers: {{'Content-Type': 'application/x-www-form-urlencoded; charset=UTF-8', 'X-Requested-With': 'XMLHttpRequest'}},
-        body: 'codes%5B%5D={ticker.lower()}&time=5&byQuarter=false&futureData=false'
-    }})
-    .then(r => r.json())
-    .then(data => callback(data))
-    .catch(e => callback(null));
+def getDataWindow(config: Dict) -> Dict[str, Tuple[Optional[pd.Timestamp], Optional[pd.Timestamp]]]:
     """
+    Date range each data kind must cover for a backtest config
+    
+    - price: START_DATE..END_DATE (the engine never looks outside the window)
+    - lpa: START_DATE..END_DATE by year (IV uses the LPA of the current year)
+    - profit: everything up to END_DATE (CAGR uses all years before the current one)
+    - selic: SELIC_LOOKBACK_YEARS before START_DATE..END_DATE (10-year average z)
     
-    try:
-        data = driver.execute_async_script(script)
-        if data and ticker.lower() in data.get('data', {}):
-            lpaData = next((ind.get('ranks', []) for ind in data['data'][ticker.lower()] if ind.get('key') == 'lpa'), [])
-            df = pd.json_normalize(lpaData)
-            if not df.empty:
-                return df[['rank', 'value']].rename(columns={'rank': 'year'})
-    except:
-        pass
-    finally:
-        driver.quit()
+    Args:
+        config: Configuration dict with 'START_DATE' and 'END_DATE'
     
-    return pd.DataFrame()
+    Returns:
+        Dict mapping data kind -> (start, end), None = unbounded
+    """
+    start = pd.Timestamp(config['START_DATE'])
+    end = pd.Timestamp(config['END_DATE'])
+    
+    return {
+        'price': (start, end),
+        'lpa': (start, end),
+        'profit': (None, end),
+        'selic': (start - pd.DateOffset(years=SELIC_LOOKBACK_YEARS), end),
+    }
 
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=1, max=3))
-def getProfitData(ticker):
-    try:
-        response = requests.get(f'http://{Config.STOCKS_API["HOST"]}:{Config.STOCKS_API["PORT"]}/api/historical?search={ticker}&fields=LUCRO%20LIQUIDO')
-        if response.status_code != 200:
-            return pd.DataFrame()
-        
-        data = response.json()['data'][0]
-        rows = []
-        for key, value in data.items():
-            if key.startswith('LUCRO LIQUIDO') and value:
-                try:
-                    year = int(key.split()[-1])
-                    rows.append({'TICKER': data['TICKER'], 'ANO': year, 'LUCRO LIQUIDO': value})
-                except (ValueError, IndexError):
-                    continue
-        
-        return pd.DataFrame(rows).sort_values('ANO') if rows else pd.DataFrame()
-    except:
-        return pd.DataFrame()
+def getPriceData(ticker, start=None, end=None):
+    return getProvider('price').getPrices(ticker, start, end)
+
+def getLPAData(ticker, start=None, end=None):
+    return getProvider('lpa').getLPA(ticker, start, end)
+
+def getProfitData(ticker, start=None, end=None):
+    return getProvider('profit').getProfits(ticker, start, end)
 
 class Backtester:
     def __init__(
@@ -104,6 +67,8 @@ class Backtester:
                    - 'INITIAL_CAPITAL': float (e.g., 10000)
                    - 'START_DATE': str (e.g., '2016-01-01')
                    - 'END_DATE': str (e.g., '2024-12-31')
+                   - 'MAX_ALLOCATION_MULTIPLIER': float, optional (default 1.5)
+                   - 'MAX_DRIFT': float, optional (e.g., 0.05), enables drift rebalancing
             portfolio: DataFrame with columns ['TICKER', 'WEIGHT']
             priceData: Dict mapping ticker -> price DataFrame
             lpaData: Dict mapping ticker -> LPA DataFrame
@@ -123,6 +88,8 @@ class Backtester:
         self.equityLog: List[Dict] = []
         self.dividendsLog: List[Dict] = []
         self.ivCache: Dict[str, Dict[str, Optional[float]]] = {}
+        self.signalTable: Optional[Dict[str, np.ndarray]] = None
+        self.tracker = PortfolioTracker(portfolio['TICKER'].tolist(), portfolio['WEIGHT'].tolist())
         
         self._setupPortfolio()
     
@@ -142,12 +109,21 @@ class Backtester:
             
             if shares > MIN_SHARES:
                 cost = shares * startPrice
-                self.positions[ticker] = shares
+                self._setPosition(ticker, shares)
                 self.cash -= cost
                 print(f'{ticker:6} | W:{row["WEIGHT"]:3} | {shares:5} shares @ R${startPrice:8.2f} = R${cost:10.2f}')
         
         print(f'\nInitial cash: R${self.cash:.2f}\n')
     
+    def _setPosition(self, ticker: str, shares: int) -> None:
+        """Update a position, keeping the valuation tracker in sync"""
+        if shares > 0:
+            self.positions[ticker] = shares
+        else:
+            self.positions.pop(ticker, None)
+        
+        self.tracker.setPosition(ticker, max(shares, 0))
+    
     def _getIV(self, ticker: str, date: pd.Timestamp) -> Optional[float]:
         """
         Get cached IV or calculate it
@@ -195,7 +171,7 @@ class Backtester:
         if sharesToBuy > 0:
             cost = sharesToBuy * currentPrice
             if self.cash >= cost:
-                self.positions[ticker] += sharesToBuy
+                self._setPosition(ticker, self.positions[ticker] + sharesToBuy)
                 self.cash -= cost
                 
                 self.trades.append({
@@ -220,7 +196,8 @@ class Backtester:
         ticker: str,
         date: pd.Timestamp,
         currentPrice: float,
-        iv: float
+        iv: float,
+        levelIdx: Optional[int] = None
     ) -> None:
         """
         Execute sell signal with partial sell levels
@@ -230,53 +207,69 @@ class Backtester:
             date: Transaction date
             currentPrice: Current market price
             iv: Intrinsic value
+            levelIdx: Precomputed PROFIT_MARGIN_THRESHOLDS index (-1 = none),
+                      looked up from iv and price when omitted
         """
         if ticker not in self.positions or self.positions[ticker] <= 0:
             return
         
-        # Get dynamic sell levels based on this stock's IV
-        sellLevels = calculatePartialSellLevels(iv, self.config['SAFETY_MARGIN'])
+        if levelIdx is None:
+            levelIdx = int(calculatePartialSellLevelIndex(np.array(iv, dtype=float), np.array(currentPrice, dtype=float)))
         
-        for level in sellLevels:
-            if currentPrice >= level['trigger_price']:
-                shares = int(self.positions[ticker] * level['sell_pct'])
-                
-                if shares > 0:
-                    proceeds = shares * currentPrice
-                    self.cash += proceeds
-                    self.positions[ticker] -= shares
-                    
-                    if self.positions[ticker] <= 0:
-                        del self.positions[ticker]
-                    
-                    self.trades.append({
-                        'Date': date,
-                        'Ticker': ticker,
-                        'Action': 'SELL',
-                        'Shares': shares,
-                        'Price': round(currentPrice, 2),
-                        'IV': round(iv, 2),
-                        'Profit_Margin': level['profit_margin'],
-                        'Level': level['level']
-                    })
-                break
+        if levelIdx < 0:
+            return
+        
+        level, multiplier, sellPct = PROFIT_MARGIN_THRESHOLDS[levelIdx]
+        shares = int(self.positions[ticker] * sellPct)
+        
+        if shares > 0:
+            proceeds = shares * currentPrice
+            self.cash += proceeds
+            self._setPosition(ticker, self.positions[ticker] - shares)
+            
+            self.trades.append({
+                'Date': date,
+                'Ticker': ticker,
+                'Action': 'SELL',
+                'Shares': shares,
+                'Price': round(currentPrice, 2),
+                'IV': round(iv, 2),
+                'Profit_Margin': multiplier,
+                'Level': level
+            })
     
     def _executeBuys(
         self,
         buySignals: Dict[str, Dict],
-        date: pd.Timestamp
+        date: pd.Timestamp,
+        row: pd.Series
     ) -> None:
         """
-        Execute buy signals using WPP allocation
+        Execute buy signals using capped WPP allocation
+        
+        Each stock may hold at most MAX_ALLOCATION_MULTIPLIER times its target
+        weight of total equity, excess capital flows to the other signals
         
         Args:
             buySignals: Dict of {ticker: signal_data}
             date: Transaction date
+            row: Merged price row for this date
         """
         if not buySignals or self.cash <= 0:
             return
         
-        allocations = allocateCapitalByWPP(buySignals, self.cash)
+        totalEquity = self.cash + self._calculatePortfolioValue(row)
+        
+        # Target weights are normalized over the whole portfolio, not just the signals
+        maxInvestment = calculateMaxInvestment(
+            self.portfolio['WEIGHT'].to_numpy(dtype=float),
+            self.tracker.values,
+            totalEquity,
+            self.config.get('MAX_ALLOCATION_MULTIPLIER', MAX_ALLOCATION_MULTIPLIER)
+        )
+        maxInvestment = dict(zip(self.tracker.tickers, maxInvestment.tolist()))
+        
+        allocations = allocateCapitalByWPP(buySignals, self.cash, maxInvestment)
         
         for ticker, allocationAmount in allocations.items():
             if allocationAmount <= 0:
@@ -289,7 +282,7 @@ class Backtester:
             if shares > 0:
                 cost = shares * currentPrice
                 if self.cash >= cost:
-                    self.positions[ticker] = self.positions.get(ticker, 0) + shares
+                    self._setPosition(ticker, self.positions.get(ticker, 0) + shares)
                     self.cash -= cost
                     
                     self.trades.append({
@@ -315,59 +308,217 @@ class Backtester:
         )
     
     def _calculatePortfolioValue(self, row: pd.Series) -> float:
-        """Calculate current portfolio market value"""
-        return sum(
-            self.positions.get(t, 0) * row.get(t, 0)
-            for t in self.portfolio['TICKER']
-            if not pd.isna(row.get(t))
-        )
+        """Calculate current portfolio market value, only changed prices are revalued"""
+        self.tracker.syncPrices(row.reindex(self.tracker.tickers).to_numpy(dtype=float))
+        return self.tracker.marketValue
+    
+    def _signalZones(self, dayIdx: int) -> Tuple[np.ndarray, np.ndarray]:
+        """SELL and BUY zone masks of every tracked ticker on a day"""
+        return self.signalTable['sell_zone'][dayIdx], self.signalTable['buy_zone'][dayIdx]
     
-    def _evaluateTradingSignals(self, row: pd.Series, date: pd.Timestamp) -> Dict[str, Dict]:
+    def _rebalance(self, dayIdx: int, date: pd.Timestamp, threshold: float) -> None:
         """
-        Evaluate buy/sell signals for all portfolio tickers
+        Restore target weights once Max Drift exceeds the threshold
         
-        Returns dict of buy signals for execution
+        Trade Value = Target Weight × Total Portfolio Value - Position Value
+        
+        Stocks in the SELL zone are never bought and stocks in the BUY zone
+        never sold, so rebalancing doesn't undo the strategy's trades. Such
+        stocks keep their value and the others are rebalanced to their
+        target weights renormalized over the remaining value. The trigger is
+        checked again over those tradable stocks only, a frozen stock far
+        off its target doesn't cause any trade by itself.
+        
+        Overweight stocks are sold first, ordered by the profit taking
+        priority Drift × (Price / V - 1), then underweight stocks are bought
+        from the most underweight down while cash allows
+        
+        Args:
+            dayIdx: Position of the day in the backtest window
+            date: Transaction date
+            threshold: Max Drift allowed (0.05 = 5%)
         """
-        buySignals = {}
+        tracker = self.tracker
+        sellZone, buyZone = self._signalZones(dayIdx)
+        
+        # Freezing a stock changes the others' targets, repeat until no trade goes against a signal
+        frozen = np.zeros(len(tracker.tickers), dtype=bool)
+        while True:
+            weights = np.where(frozen, 0.0, tracker.targetWeights)
+            if weights.sum() <= 0:
+                return
+            
+            freeValue = tracker.marketValue - tracker.values[frozen].sum()
+            tradeValues = np.where(frozen, 0.0, weights / weights.sum() * freeValue - tracker.values)
+            
+            conflicts = ~frozen & ((sellZone & (tradeValues > 0)) | (buyZone & (tradeValues < 0)))
+            if not conflicts.any():
+                break
+            frozen |= conflicts
         
-        for _, pRow in self.portfolio.iterrows():
-            ticker = pRow['TICKER']
-            if pd.isna(row.get(ticker)):
+        if freeValue <= 0:
+            return
+        
+        # Drift of the tradable stocks against their renormalized weights
+        drift = np.where(frozen, 0.0, tracker.values / freeValue - weights / weights.sum())
+        if np.abs(drift).max() <= threshold:
+            return
+        
+        sells, buys = [], []
+        for i, ticker in enumerate(tracker.tickers):
+            price = tracker.prices[i]
+            if price <= 0:
                 continue
             
-            currentPrice = row[ticker]
-            iv = self._getIV(ticker, date)
-            
-            if iv is None or iv <= 0:
+            shares = int(abs(tradeValues[i]) / price)
+            if shares <= 0:
                 continue
             
-            buyPrice = calculateBuyPrice(iv, self.config['SAFETY_MARGIN'])
-            sellPrice = calculateSellPrice(iv, self.config['SAFETY_MARGIN'])
+            if tradeValues[i] < 0:
+                iv = self._getIV(ticker, date)
+                priority = drift[i] * (price / iv - 1) if iv else 0
+                sells.append((priority, ticker, min(shares, self.positions.get(ticker, 0)), price, drift[i]))
+            else:
+                buys.append((drift[i], ticker, shares, price, drift[i]))
+        
+        for _, ticker, shares, price, tickerDrift in sorted(sells, key=lambda s: -s[0]):
+            if shares <= 0:
+                continue
             
-            if not buyPrice or not sellPrice:
+            self.cash += shares * price
+            self._setPosition(ticker, self.positions[ticker] - shares)
+            self.trades.append({
+                'Date': date,
+                'Ticker': ticker,
+                'Action': 'REBALANCE_SELL',
+                'Shares': shares,
+                'Price': round(price, 2),
+                'Drift': round(tickerDrift, 4),
+            })
+        
+        for _, ticker, shares, price, tickerDrift in sorted(buys, key=lambda b: b[0]):
+            shares = min(shares, int(self.cash / price))
+            if shares <= 0:
                 continue
             
+            self.cash -= shares * price
+            self._setPosition(ticker, self.positions.get(ticker, 0) + shares)
+            self.trades.append({
+                'Date': date,
+                'Ticker': ticker,
+                'Action': 'REBALANCE_BUY',
+                'Shares': shares,
+                'Price': round(price, 2),
+                'Drift': round(tickerDrift, 4),
+            })
+    
+    def _requireSelicCoverage(self) -> pd.DataFrame:
+        """
+        Get the SELIC history, making sure it reaches SELIC_LOOKBACK_YEARS before START_DATE
+        
+        A history loaded for a shorter window (e.g. by loadData() for another
+        config) is reloaded once for this config's window
+        
+        Returns:
+            SELIC DataFrame
+        
+        Raises:
+            RuntimeError: if SELIC is unavailable or still starts after the
+                          lookback window, which would bias every 10-year average
+        """
+        start, end = getDataWindow(self.config)['selic']
+        latestStart = start + pd.Timedelta(days=SELIC_START_SLACK_DAYS)
+        
+        selic = requireSelicData()
+        if selic['data'].min() <= latestStart:
+            return selic
+        
+        try:
+            selic = loadSelicData(start, end)
+        except Exception as e:
+            raise RuntimeError(f'SELIC data unavailable: {e!r}') from e
+        
+        if selic.empty or selic['data'].min() > latestStart:
+            first = selic['data'].min().date() if not selic.empty else None
+            raise RuntimeError(f'SELIC data starts at {first}, the backtest needs it from {start.date()}')
+        
+        return selic
+    
+    def _buildSignalTable(self, merged: pd.DataFrame) -> Dict[str, np.ndarray]:
+        """
+        Precompute IVs, thresholds, signals, sell levels and WPP for every day and ticker
+        
+        Args:
+            merged: Merged price DataFrame of the backtest window
+        
+        Returns:
+            Signal table from buildSignalTable() plus the engine's 'sell_zone'
+            and 'buy_zone' masks (days × tickers)
+        
+        Raises:
+            RuntimeError: if SELIC data is unavailable or doesn't cover the
+                          lookback window, instead of running the strategy
+                          with missing or biased IVs
+        """
+        self._requireSelicCoverage()
+        
+        tickers = self.tracker.tickers
+        dates = merged['Date'].tolist()
+        prices = merged[tickers].to_numpy(dtype=float)
+        
+        # IVs only change with the year (LPA, profits) or the SELIC rows in use,
+        # so they are computed on those days and carried forward
+        years = merged['Date'].dt.year.to_numpy()
+        changed = getRateChangeMask(merged['Date'])
+        changed[1:] |= years[1:] != years[:-1]
+        segments = np.cumsum(changed) - 1
+        
+        ivs = np.full(prices.shape, np.nan)
+        for j, ticker in enumerate(tickers):
+            segmentIVs = np.array([self._getIV(ticker, dates[i]) for i in np.flatnonzero(changed)], dtype=float)
+            ivs[:, j] = segmentIVs[segments]
+        ivs[np.isnan(prices)] = np.nan
+        
+        table = buildSignalTable(ivs, prices, self.portfolio['WEIGHT'].to_numpy(dtype=float), self.config['SAFETY_MARGIN'])
+        
+        table['sell_zone'], table['buy_zone'] = calculateSignalZones(table)
+        
+        return table
+    
+    def _evaluateTradingSignals(self, dayIdx: int, date: pd.Timestamp) -> Dict[str, Dict]:
+        """
+        Evaluate buy/sell signals for all portfolio tickers from the signal table
+        
+        Returns dict of buy signals for execution
+        """
+        table = self.signalTable
+        buySignals = {}
+        
+        for j in np.flatnonzero(table['sell_zone'][dayIdx] | table['buy_zone'][dayIdx]):
+            ticker = self.tracker.tickers[j]
+            currentPrice = float(table['price'][dayIdx, j])
+            iv = float(table['iv'][dayIdx, j])
+            
             # SELL signal
-            if currentPrice >= sellPrice:
-                self._executeSell(ticker, date, currentPrice, iv)
+            if table['sell_zone'][dayIdx, j]:
+                self._executeSell(ticker, date, currentPrice, iv, int(table['level'][dayIdx, j]))
             
             # BUY signal
-            elif currentPrice <= buyPrice and self.cash > currentPrice * MIN_CASH_FOR_BUY:
-                wpp = calculateWPP(iv, currentPrice, pRow['WEIGHT'])
+            elif self.cash > currentPrice * MIN_CASH_FOR_BUY:
+                wpp = float(table['wpp'][dayIdx, j])
                 
                 if wpp > 0:
                     buySignals[ticker] = {
                         'iv': iv,
                         'price': currentPrice,
                         'wpp': wpp,
-                        'buy_price': buyPrice,
+                        'buy_price': float(table['buy_price'][dayIdx, j]),
                     }
         
         return buySignals
     
-    def backtest(self) -> None:
-        """Execute backtest over entire date range"""
-        # Merge price data
+    def _mergePriceData(self) -> pd.DataFrame:
+        """Merge Close and Dividends of every ticker by date, limited to the backtest window"""
         merged = None
         for _, row in self.portfolio.iterrows():
             ticker = row['TICKER']
@@ -378,46 +529,77 @@ class Backtester:
         merged = merged.sort_values('Date').reset_index(drop=True)
         startDate = pd.to_datetime(self.config['START_DATE'])
         endDate = pd.to_datetime(self.config['END_DATE'])
-        merged = merged[(merged['Date'] >= startDate) & (merged['Date'] <= endDate)]
-        
+        return merged[(merged['Date'] >= startDate) & (merged['Date'] <= endDate)]
+    
+    def _printHeader(self) -> None:
+        startDate = pd.to_datetime(self.config['START_DATE'])
+        endDate = pd.to_datetime(self.config['END_DATE'])
         strategyName = "GRAHAM'S STRATEGY" if self.useStrategy else "BUY & HOLD"
         print("\n" + "="*70)
         print(f"BACKTEST: {strategyName}".center(70))
         print(f"Period: {startDate.date()} to {endDate.date()}".center(70))
         print("="*70 + "\n")
+    
+    def _processDay(self, dayIdx: int, totalDays: int, row: pd.Series) -> None:
+        """
+        Run one trading day: dividends, signals, buys, rebalancing and equity log
         
-        for dayIdx, (_, row) in enumerate(merged.iterrows()):
-            date = row['Date']
-            
-            portfolioValue = self._calculatePortfolioValue(row)
-            equity = self.cash + portfolioValue
-            self._printProgress(dayIdx, len(merged), equity)
-            
-            # Process dividends
-            for _, pRow in self.portfolio.iterrows():
-                ticker = pRow['TICKER']
-                if not pd.isna(row.get(ticker)):
-                    priceRow = self.priceData[ticker][self.priceData[ticker]['Date'] == date]
-                    if len(priceRow) > 0:
-                        self._processDividends(ticker, date, priceRow.iloc[0])
-            
-            # Apply Graham's Strategy
-            if self.useStrategy:
-                buySignals = self._evaluateTradingSignals(row, date)
-                if buySignals:
-                    self._executeBuys(buySignals, date)
+        Args:
+            dayIdx: Position of the day in the backtest window
+            totalDays: Number of days in the backtest window
+            row: Merged price row for this date
+        """
+        date = row['Date']
+        
+        portfolioValue = self._calculatePortfolioValue(row)
+        equity = self.cash + portfolioValue
+        self._printProgress(dayIdx, totalDays, equity)
+        
+        # Process dividends
+        for _, pRow in self.portfolio.iterrows():
+            ticker = pRow['TICKER']
+            if not pd.isna(row.get(ticker)):
+                priceRow = self.priceData[ticker][self.priceData[ticker]['Date'] == date]
+                if len(priceRow) > 0:
+                    self._processDividends(ticker, date, priceRow.iloc[0])
+        
+        # Apply Graham's Strategy
+        if self.useStrategy:
+            buySignals = self._evaluateTradingSignals(dayIdx, date)
+            if buySignals:
+                self._executeBuys(buySignals, date, row)
             
-            # Log daily equity
-            portfolioValue = self._calculatePortfolioValue(row)
-            self.equityLog.append({
-                'Date': date,
-                'Cash': round(self.cash, 2),
-                'Portfolio_Value': round(portfolioValue, 2),
-                'Total_Equity': round(self.cash + portfolioValue, 2)
-            })
+            maxDrift = self.config.get('MAX_DRIFT')
+            if maxDrift is not None and self.tracker.needsRebalance(maxDrift):
+                self._rebalance(dayIdx, date, maxDrift)
+        
+        # Log daily equity
+        portfolioValue = self._calculatePortfolioValue(row)
+        self.equityLog.append({
+            'Date': date,
+            'Cash': round(self.cash, 2),
+            'Portfolio_Value': round(portfolioValue, 2),
+            'Total_Equity': round(self.cash + portfolioValue, 2)
+        })
+    
+    def backtest(self) -> None:
+        """Execute backtest over entire date range"""
+        merged = self._mergePriceData()
+        
+        if self.useStrategy:
+            self.signalTable = self._buildSignalTable(merged)
+        
+        self._printHeader()
+        
+        for dayIdx, (_, row) in enumerate(merged.iterrows()):
+            self._processDay(dayIdx, len(merged), row)
         
         print("\n" + "="*70 + "\n")
     
+    def _equityFrame(self) -> pd.DataFrame:
+        """Daily equity log as a DataFrame"""
+        return pd.DataFrame(self.equityLog)
+    
     def getResults(self) -> Optional[Dict]:
         """
         Compile backtest results
@@ -426,7 +608,7 @@ class Backtester:
             Dict with keys: equity_curve, trades, dividends, final_equity,
                           total_return, total_dividends, num_trades
         """
-        equityDf = pd.DataFrame(self.equityLog)
+        equityDf = self._equityFrame()
         tradesDf = pd.DataFrame(self.trades) if self.trades else pd.DataFrame()
         dividendsDf = pd.DataFrame(self.dividendsLog) if self.dividendsLog else pd.DataFrame()
         
@@ -445,4 +627,168 @@ class Backtester:
             'total_return': totalReturn,
             'total_dividends': totalDividends,
             'num_trades': len(tradesDf),
-        }
\ No newline at end of file
+        }
+
+class EventDrivenBacktester(Backtester):
+    """
+    Backtester that only runs the trading logic on actionable days
+    
+    A day is an event when something can happen at the current positions
+    and cash: a dividend or a partial sell level of a held stock, a BUY zone
+    with positive WPP and enough cash, or (with MAX_DRIFT) a drift breach.
+    Those days are processed exactly like Backtester does. Positions and
+    cash can't change in between, so the equity of the other days is filled
+    with vectorized position × price products and the cost scales with the
+    number of events.
+    """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        
+        self.eventIndex: Dict[str, Dict] = {}
+        self.equityDates = np.empty(0, dtype='datetime64[ns]')
+        self.equityCash = np.empty(0)
+        self.equityValue = np.empty(0)
+    
+    def _buildEventIndex(self, merged: pd.DataFrame) -> Dict[str, Dict]:
+        """
+        Precompute the day indexes where each ticker may need attention
+        
+        Returns:
+            {'buy': {ticker: BUY zone days with positive WPP},
+             'levels': {ticker: [SELL zone days per PROFIT_MARGIN_THRESHOLDS level]},
+             'dividend': {ticker: days}}
+        """
+        tickers = self.tracker.tickers
+        prices = merged[tickers].to_numpy(dtype=float)
+        dividends = merged[[f'{t}_Div' for t in tickers]].to_numpy(dtype=float)
+        
+        with np.errstate(invalid='ignore'):
+            dividendDays = (dividends > 0) & ~np.isnan(prices)
+        
+        index = {'buy': {}, 'levels': {}, 'dividend': {}}
+        for j, ticker in enumerate(tickers):
+            index['dividend'][ticker] = np.flatnonzero(dividendDays[:, j])
+            
+            if self.signalTable is None:
+                continue
+            
+            sellZone = self.signalTable['sell_zone'][:, j]
+            levels = self.signalTable['level'][:, j]
+            index['buy'][ticker] = np.flatnonzero(self.signalTable['buy_zone'][:, j] & (self.signalTable['wpp'][:, j] > 0))
+            index['levels'][ticker] = [np.flatnonzero(sellZone & (levels == k)) for k in range(len(PROFIT_MARGIN_THRESHOLDS))]
+        
+        return index
+    
+    def _nextEvent(self, day: int, bound: int, prices: np.ndarray) -> int:
+        """
+        First actionable day in [day, bound) at the current positions and cash
+        
+        Args:
+            day: First candidate day
+            bound: Day returned when there is no event before it
+            prices: Price matrix of the backtest window (days × tickers)
+        """
+        def firstFrom(days: np.ndarray) -> int:
+            k = np.searchsorted(days, day)
+            return int(days[k]) if k < len(days) else bound
+        
+        nextDay = bound
+        for j, ticker in enumerate(self.tracker.tickers):
+            shares = self.positions.get(ticker, 0)
+            
+            # Dividends and sells do nothing without a position, or when the partial sell rounds to 0 shares
+            if shares > 0:
+                nextDay = min(nextDay, firstFrom(self.eventIndex['dividend'][ticker]))
+                for k, days in enumerate(self.eventIndex['levels'].get(ticker, [])):
+                    if int(shares * PROFIT_MARGIN_THRESHOLDS[k][2]) > 0:
+                        nextDay = min(nextDay, firstFrom(days))
+            
+            # Cash is constant until the next event, only BUY zone days it can afford count
+            buyDays = self.eventIndex['buy'].get(ticker)
+            if buyDays is not None:
+                candidates = buyDays[np.searchsorted(buyDays, day):np.searchsorted(buyDays, nextDay)]
+                affordable = np.flatnonzero(self.cash > prices[candidates, j] * MIN_CASH_FOR_BUY)
+                if affordable.size > 0:
+                    nextDay = int(candidates[affordable[0]])
+        
+        return nextDay
+    
+    def _firstDriftTrigger(self, prices: np.ndarray, threshold: float) -> Optional[int]:
+        """
+        First day (relative to prices) where Max Drift exceeds threshold at current positions
+        
+        Args:
+            prices: Price block (days × tickers) with constant positions
+            threshold: Max Drift allowed (0.05 = 5%)
+        """
+        values = np.nan_to_num(prices, nan=0.0) * self.tracker.shares
+        totals = values.sum(axis=1, keepdims=True)
+        
+        with np.errstate(invalid='ignore', divide='ignore'):
+            drift = np.abs(values / totals - self.tracker.targetWeights).max(axis=1)
+        
+        triggered = np.flatnonzero((totals[:, 0] > 0) & (drift > threshold))
+        return int(triggered[0]) if triggered.size > 0 else None
+    
+    def backtest(self) -> None:
+        """Execute backtest, jumping straight between actionable days"""
+        merged = self._mergePriceData()
+        
+        if self.useStrategy:
+            self.signalTable = self._buildSignalTable(merged)
+        
+        self.eventIndex = self._buildEventIndex(merged)
+        
+        self._printHeader()
+        
+        totalDays = len(merged)
+        prices = merged[self.tracker.tickers].to_numpy(dtype=float)
+        maxDrift = self.config.get('MAX_DRIFT') if self.useStrategy else None
+        
+        self.equityDates = merged['Date'].to_numpy()
+        self.equityCash = np.empty(totalDays)
+        self.equityValue = np.empty(totalDays)
+        
+        day = 0
+        while day < totalDays:
+            eventDay = self._nextEvent(day, totalDays, prices)
+            
+            # A drift breach between events is an event too
+            if maxDrift is not None and eventDay > day:
+                trigger = self._firstDriftTrigger(prices[day:eventDay], maxDrift)
+                if trigger is not None:
+                    eventDay = day + trigger
+            
+            # Quiet days: positions and cash are constant
+            if eventDay > day:
+                self.equityCash[day:eventDay] = self.cash
+                self.equityValue[day:eventDay] = np.nan_to_num(prices[day:eventDay], nan=0.0) @ self.tracker.shares
+            
+            if eventDay >= totalDays:
+                break
+            
+            self._processDay(eventDay, totalDays, merged.iloc[eventDay])
+            # Event days are logged through the arrays like every other day
+            self.equityLog.pop()
+            self.equityCash[eventDay] = self.cash
+            self.equityValue[eventDay] = self.tracker.marketValue
+            
+            day = eventDay + 1
+        
+        if totalDays > 0:
+            self._printProgress(totalDays - 1, totalDays, self.cash + self.equityValue[-1])
+        
+        print("\n" + "="*70 + "\n")
+    
+    def _equityFrame(self) -> pd.DataFrame:
+        """Daily equity log built from the cash and position value arrays"""
+        if len(self.equityCash) == 0:
+            return pd.DataFrame()
+        
+        return pd.DataFrame({
+            'Date': self.equityDates,
+            'Cash': roundLikePython(self.equityCash, 2),
+            'Portfolio_Value': roundLikePython(self.equityValue, 2),
+            'Total_Equity': roundLikePython(self.equityCash + self.equityValue, 2),
+        })
@@ -0,0 +1,201 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from imports import *
+
+import economics
+
+DEFAULT_CACHE_DIR = os.path.join('.cache', 'results')
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024  # 512 MB
+CACHE_EXTENSION = '.pkl'
+
+def hashDataFrame(df: Optional[pd.DataFrame]) -> str:
+    """
+    Content hash of a DataFrame (values, index, columns and dtypes)
+
+    Args:
+        df: DataFrame to hash (None and empty frames are valid inputs)
+
+    Returns:
+        Hex digest identifying the DataFrame contents
+    """
+    digest = hashlib.sha256()
+
+    if df is None:
+        digest.update(b'None')
+        return digest.hexdigest()
+
+    digest.update(repr(list(df.columns)).encode())
+    digest.update(repr([str(dtype) for dtype in df.dtypes]).encode())
+
+    if not df.empty:
+        digest.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+
+    return digest.hexdigest()
+
+def hashDataDict(data: Dict[str, pd.DataFrame]) -> str:
+    """
+    Content hash of a {ticker: DataFrame} dict, independent of insertion order
+
+    Args:
+        data: dict mapping ticker -> DataFrame
+
+    Returns:
+        Hex digest identifying the data version
+    """
+    digest = hashlib.sha256()
+    for ticker in sorted(data):
+        digest.update(ticker.encode())
+        digest.update(hashDataFrame(data[ticker]).encode())
+    return digest.hexdigest()
+
+def makeCacheKey(
+    config: Dict,
+    portfolio: pd.DataFrame,
+    priceData: Dict[str, pd.DataFrame],
+    lpaData: Dict[str, pd.DataFrame],
+    profitData: Dict[str, pd.DataFrame],
+    useStrategy: bool,
+    engineVersion: str
+) -> str:
+    """
+    Build the content-addressed key for a backtest run
+
+    Any change to the config, portfolio, market data (including the SELIC
+    series behind the IVs) or engine version produces a different key, so
+    stale results are never returned.
+
+    Args:
+        config: Configuration dict
+        portfolio: Portfolio DataFrame
+        priceData, lpaData, profitData: Market data dicts
+        useStrategy: If True, Graham's strategy; else Buy & Hold
+        engineVersion: Backtester engine version string
+
+    Returns:
+        Hex digest used as the cache key
+
+    Raises:
+        RuntimeError: if the strategy needs SELIC and it can't be loaded
+    """
+    # Only the strategy reads SELIC (through the IVs), Buy & Hold runs don't load it
+    selic = hashDataFrame(economics.requireSelicData()) if useStrategy else None
+
+    payload = {
+        'config': json.dumps(config, sort_keys=True, default=str),
+        'portfolio': hashDataFrame(portfolio),
+        'price': hashDataDict(priceData),
+        'lpa': hashDataDict(lpaData),
+        'profit': hashDataDict(profitData),
+        'selic': selic,
+        'strategy': bool(useStrategy),
+        'engine': engineVersion,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+class ResultCache:
+    def __init__(self, cacheDir: str = DEFAULT_CACHE_DIR, maxBytes: int = DEFAULT_MAX_BYTES):
+        """
+        On-disk cache of backtest results with size-based LRU eviction
+
+        Each entry stores the full results dict (equity curve, trades,
+        dividends and summary values) under its content-addressed key.
+        Recency is tracked through the file modification time.
+
+        Args:
+            cacheDir: Directory holding the cached results
+            maxBytes: Maximum total size of the cache before eviction
+        """
+        self.cacheDir = cacheDir
+        self.maxBytes = maxBytes
+        self.lock = threading.Lock()
+
+        os.makedirs(self.cacheDir, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        """Path of the cache file for a key"""
+        return os.path.join(self.cacheDir, f'{key}{CACHE_EXTENSION}')
+
+    def get(self, key: str) -> Optional[Dict]:
+        """
+        Load cached results for a key
+
+        Args:
+            key: Cache key from makeCacheKey()
+
+        Returns:
+            Results dict or None on a miss (or unreadable entry)
+        """
+        path = self._path(key)
+
+        with self.lock:
+            if not os.path.exists(path):
+                return None
+
+            try:
+                with open(path, 'rb') as f:
+                    results = pickle.load(f)
+            except Exception:
+                # Corrupt or incompatible entry, drop it
+                os.remove(path)
+                return None
+
+            # Mark as recently used
+            os.utime(path, None)
+
+        return results
+
+    def put(self, key: str, results: Optional[Dict]) -> None:
+        """
+        Store results for a key, evicting least recently used entries if needed
+
+        Args:
+            key: Cache key from makeCacheKey()
+            results: Results dict from Backtester.getResults()
+        """
+        if results is None:
+            return
+
+        path = self._path(key)
+        tmpPath = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+
+        with self.lock:
+            # Write to a temp file first so readers never see partial entries
+            with open(tmpPath, 'wb') as f:
+                pickle.dump(results, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmpPath, path)
+
+            self._evict()
+
+    def _evict(self) -> None:
+        """Remove least recently used entries until the cache fits in maxBytes"""
+        entries = []
+        for name in os.listdir(self.cacheDir):
+            if not name.endswith(CACHE_EXTENSION):
+                continue
+            path = os.path.join(self.cacheDir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        totalBytes = sum(size for _, size, _ in entries)
+
+        for _, size, path in sorted(entries):
+            if totalBytes <= self.maxBytes:
+                break
+            try:
+                os.remove(path)
+                totalBytes -= size
+            except FileNotFoundError:
+                continue
+
+    def clear(self) -> None:
+        """Remove every cached entry"""
+        with self.lock:
+            for name in os.listdir(self.cacheDir):
+                if name.endswith(CACHE_EXTENSION):
+                    os.remove(os.path.join(self.cacheDir, name))
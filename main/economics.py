@@ -1,8 +1,10 @@
 import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from imports import *
+from providers import getProvider
 
 PROFIT_MARGIN_THRESHOLDS = [
     (1, 1.50, 0.50),
@@ -12,12 +14,68 @@ PROFIT_MARGIN_THRESHOLDS = [
     (5, 2.20, 1.00),
 ]
 
-# Load SELIC data
-selicDf = requests.get('https://api.bcb.gov.br/dados/serie/bcdata.sgs.4189/dados?formato=json')
-selicDf = pd.DataFrame(selicDf.json())
-selicDf['data'] = pd.to_datetime(selicDf['data'], format='%d/%m/%Y')
-selicDf['valor'] = selicDf['valor'].astype('float64')
-selicDf = selicDf.sort_values('data').reset_index(drop=True)
+MAX_ALLOCATION_MULTIPLIER = 1.5  # Max position value as a multiple of its target weight
+
+# Signal codes of the array API
+SIGNAL_SELL = -1
+SIGNAL_HOLD = 0
+SIGNAL_BUY = 1
+
+# SELIC data, loaded from the 'selic' provider on first use
+selicDf = None
+selicError = None  # Failure of the lazy load, re-raised instead of fetching again
+
+def loadSelicData(start=None, end=None) -> pd.DataFrame:
+    """
+    Fetch SELIC history from the active 'selic' provider
+    
+    Args:
+        start, end: Optional date bounds (None = full history)
+    """
+    global selicDf, selicError
+    selicError = None
+    selicDf = getProvider('selic').getSelic(start, end)
+    return selicDf
+
+def requireSelicData() -> pd.DataFrame:
+    """
+    Get the SELIC history, loading it on first use
+    
+    A failed load is remembered, later calls raise the same error without
+    hitting the provider again (call loadSelicData() to retry)
+    
+    Returns:
+        SELIC DataFrame
+    
+    Raises:
+        RuntimeError: if SELIC could not be loaded or is empty
+    """
+    global selicError
+    
+    if selicDf is None and selicError is None:
+        try:
+            loadSelicData()
+        except Exception as e:
+            selicError = e
+    
+    if selicError is not None:
+        raise RuntimeError(f'SELIC data unavailable: {selicError!r}') from selicError
+    
+    if len(selicDf) == 0:
+        raise RuntimeError('SELIC data unavailable: the selic provider returned no rows')
+    
+    return selicDf
+
+def setSelicData(df: pd.DataFrame) -> None:
+    """
+    Use an already loaded SELIC history instead of fetching it
+    
+    Args:
+        df: DataFrame with 'data' (datetime) and 'valor' (float, %) columns
+    """
+    global selicDf, selicError
+    selicError = None
+    selicDf = df.sort_values('data').reset_index(drop=True)
 
 def getInterestRates(date: pd.Timestamp) -> Tuple[Optional[float], Optional[float]]:
     """
@@ -32,9 +90,10 @@ def getInterestRates(date: pd.Timestamp) -> Tuple[Optional[float], Optional[floa
         - z: Average SELIC rate over the 10 years preceding target date
         - (None, None) if data unavailable
     """
-    global selicDf
+    if selicDf is None:
+        requireSelicData()
     
-    if selicDf is None or len(selicDf) == 0:
+    if len(selicDf) == 0:
         return None, None
     
     # Ensure date is datetime
@@ -59,6 +118,34 @@ def getInterestRates(date: pd.Timestamp) -> Tuple[Optional[float], Optional[floa
     
     return y, z
 
+def getRateChangeMask(dates: pd.Series) -> np.ndarray:
+    """
+    Days where getInterestRates() may differ from the previous day
+    
+    y and z only depend on which SELIC rows lie on or before the date and
+    which lie inside its 10-year window, so consecutive days selecting the
+    same rows get exactly the same rates
+    
+    Args:
+        dates: Sorted trading dates
+    
+    Returns:
+        Boolean mask (True on the first day and wherever the rates may change)
+    """
+    selicDates = np.sort(requireSelicData()['data'].to_numpy(dtype='datetime64[ns]'))
+    dates = pd.DatetimeIndex(dates)
+    
+    end = np.searchsorted(selicDates, dates.to_numpy(dtype='datetime64[ns]'), side='right')
+    start = np.searchsorted(selicDates, (dates.normalize() - pd.DateOffset(years=10)).to_numpy(dtype='datetime64[ns]'), side='left')
+    
+    # getInterestRates can't build the window of a Feb 29 (no such day 10 years before), keep those days apart
+    leapDay = (dates.month == 2) & (dates.day == 29)
+    
+    key = np.column_stack([end, start, leapDay])
+    changed = np.ones(len(dates), dtype=bool)
+    changed[1:] = (key[1:] != key[:-1]).any(axis=1)
+    return changed
+
 def calculateCAGR(profitList: List[float], yearList: List[int]) -> Optional[float]:
     """
     Calculate Compound Annual Growth Rate
@@ -112,7 +199,13 @@ def calculateIntrinsicValue(
     
     Returns:
         Intrinsic Value (R$) or None if calculation fails
+    
+    Raises:
+        RuntimeError: if SELIC data is unavailable, so a failed load can't
+                      silently turn every IV into None
     """
+    requireSelicData()
+    
     try:
         # Validate profit data exists
         if ticker not in profitData or profitData[ticker].empty:
@@ -292,19 +385,215 @@ def calculateWPP(
     wpp = round(discountFactor * strategicWeight, 4)
     return wpp
 
+def roundLikePython(values: np.ndarray, ndigits: int) -> np.ndarray:
+    """
+    Element-wise round() with Python's exact semantics
+    
+    np.round scales, rounds half to even and rescales, which can disagree with
+    round() when the scaled value lands on a tie. Those few elements fall back
+    to round() so the array API matches the scalar functions exactly
+    
+    Args:
+        values: array of floats (NaN passes through)
+        ndigits: decimal places
+    
+    Returns:
+        Rounded float array
+    """
+    values = np.asarray(values, dtype=float)
+    rounded = np.round(values, ndigits)
+    
+    scaled = values * 10.0 ** ndigits
+    with np.errstate(invalid='ignore'):
+        ties = np.isfinite(scaled) & (np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6)
+    
+    if ties.any():
+        rounded = np.array(rounded, copy=True)
+        rounded[ties] = [round(v, ndigits) for v in values[ties].tolist()]
+    
+    return rounded
+
+def calculateBuyPrices(intrinsicValue: np.ndarray, safetyMargin: float) -> np.ndarray:
+    """
+    Array version of calculateBuyPrice: V × (1 - m)
+    
+    Args:
+        intrinsicValue: IV array, NaN where unavailable
+        safetyMargin: safety margin as decimal (0.50 = 50%)
+    
+    Returns:
+        Buy prices, NaN where IV is unavailable or <= 0
+    """
+    iv = np.asarray(intrinsicValue, dtype=float)
+    with np.errstate(invalid='ignore'):
+        return np.where(iv > 0, roundLikePython(iv * (1 - safetyMargin), 2), np.nan)
+
+def calculateSellPrices(intrinsicValue: np.ndarray, safetyMargin: float) -> np.ndarray:
+    """
+    Array version of calculateSellPrice: V × (1 + m)
+    
+    Args:
+        intrinsicValue: IV array, NaN where unavailable
+        safetyMargin: safety margin as decimal (0.50 = 50%)
+    
+    Returns:
+        Sell prices, NaN where IV is unavailable or <= 0
+    """
+    iv = np.asarray(intrinsicValue, dtype=float)
+    with np.errstate(invalid='ignore'):
+        return np.where(iv > 0, roundLikePython(iv * (1 + safetyMargin), 2), np.nan)
+
+def generateTradingSignals(
+    currentPrice: np.ndarray,
+    intrinsicValue: np.ndarray,
+    safetyMargin: float
+) -> np.ndarray:
+    """
+    Array version of generateTradingSignal
+    
+    Args:
+        currentPrice: price array (e.g. days × tickers)
+        intrinsicValue: IV array of the same shape, NaN where unavailable
+        safetyMargin: safety margin as decimal
+    
+    Returns:
+        int8 array of SIGNAL_BUY, SIGNAL_HOLD or SIGNAL_SELL
+    """
+    price = np.asarray(currentPrice, dtype=float)
+    buyPrices = calculateBuyPrices(intrinsicValue, safetyMargin)
+    sellPrices = calculateSellPrices(intrinsicValue, safetyMargin)
+    
+    with np.errstate(invalid='ignore'):
+        valid = ~np.isnan(buyPrices) & ~(price <= 0)
+        signals = np.where(price <= buyPrices, SIGNAL_BUY, np.where(price >= sellPrices, SIGNAL_SELL, SIGNAL_HOLD))
+    
+    return np.where(valid, signals, SIGNAL_HOLD).astype(np.int8)
+
+def calculatePartialSellLevelIndex(
+    intrinsicValue: np.ndarray,
+    currentPrice: np.ndarray
+) -> np.ndarray:
+    """
+    Array version of the partial sell level lookup
+    
+    Returns the index into PROFIT_MARGIN_THRESHOLDS of the first level whose
+    trigger price (rounded V × multiplier) the price has reached, matching
+    the order Backtester scans calculatePartialSellLevels()
+    
+    Args:
+        intrinsicValue: IV array, NaN where unavailable
+        currentPrice: price array of the same shape
+    
+    Returns:
+        int8 array of level indexes, -1 where no level is triggered
+    """
+    iv = np.asarray(intrinsicValue, dtype=float)
+    price = np.asarray(currentPrice, dtype=float)
+    multipliers = np.array([multiplier for _, multiplier, _ in PROFIT_MARGIN_THRESHOLDS])
+    
+    triggers = roundLikePython(iv[..., np.newaxis] * multipliers, 2)
+    with np.errstate(invalid='ignore'):
+        hit = (price[..., np.newaxis] >= triggers) & (iv[..., np.newaxis] > 0)
+    
+    return np.where(hit.any(axis=-1), np.argmax(hit, axis=-1), -1).astype(np.int8)
+
+def calculateWPPs(
+    intrinsicValue: np.ndarray,
+    currentPrice: np.ndarray,
+    strategicWeight: np.ndarray
+) -> np.ndarray:
+    """
+    Array version of calculateWPP: (IV / Price) × SW, rounded to 4 places
+    
+    Args:
+        intrinsicValue: IV array, NaN where unavailable
+        currentPrice: price array of the same shape
+        strategicWeight: SW per ticker, broadcast over the last axis
+    
+    Returns:
+        WPP array, 0 where inputs are invalid
+    """
+    iv = np.asarray(intrinsicValue, dtype=float)
+    price = np.asarray(currentPrice, dtype=float)
+    sw = np.asarray(strategicWeight, dtype=float)
+    
+    with np.errstate(invalid='ignore', divide='ignore'):
+        invalid = ~(iv > 0) | (price <= 0)
+        wpp = roundLikePython(iv / price * sw, 4)
+    
+    return np.where(invalid, 0.0, wpp)
+
+def buildSignalTable(
+    intrinsicValue: np.ndarray,
+    currentPrice: np.ndarray,
+    strategicWeight: np.ndarray,
+    safetyMargin: float
+) -> Dict[str, np.ndarray]:
+    """
+    Vectorized signal stage for every ticker and day in one call
+    
+    Args:
+        intrinsicValue: IV matrix (days × tickers), NaN where unavailable
+        currentPrice: price matrix (days × tickers), NaN where not traded
+        strategicWeight: SW per ticker
+        safetyMargin: safety margin as decimal
+    
+    Returns:
+        Dict of arrays shaped like currentPrice:
+        'iv', 'price', 'buy_price', 'sell_price', 'signal', 'level', 'wpp'
+    """
+    iv = np.asarray(intrinsicValue, dtype=float)
+    price = np.asarray(currentPrice, dtype=float)
+    
+    return {
+        'iv': iv,
+        'price': price,
+        'buy_price': calculateBuyPrices(iv, safetyMargin),
+        'sell_price': calculateSellPrices(iv, safetyMargin),
+        'signal': generateTradingSignals(price, iv, safetyMargin),
+        'level': calculatePartialSellLevelIndex(iv, price),
+        'wpp': calculateWPPs(iv, price, strategicWeight),
+    }
+
+def calculateSignalZones(table: Dict[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    SELL and BUY zone masks the engines act on, from a buildSignalTable() result
+    
+    SELL is checked before BUY and zero or missing thresholds are skipped,
+    the same order Backtester evaluates a day in
+    
+    Args:
+        table: Signal table from buildSignalTable()
+    
+    Returns:
+        (sellZone, buyZone) boolean arrays shaped like table['price']
+    """
+    price = table['price']
+    
+    with np.errstate(invalid='ignore'):
+        active = ~np.isnan(table['buy_price']) & (table['buy_price'] != 0) & (table['sell_price'] != 0)
+        sellZone = active & (price >= table['sell_price'])
+        buyZone = active & ~sellZone & (price <= table['buy_price'])
+    
+    return sellZone, buyZone
+
 def allocateCapitalByWPP(
     buySignals: Dict[str, Dict],
-    totalCapital: float
+    totalCapital: float,
+    maxInvestment: Optional[Dict[str, float]] = None
 ) -> Dict[str, float]:
     """
     Proportional Capital Distribution (PCD)
     
-    Allocate capital based on WPP values proportionally
+    Allocate capital based on WPP values proportionally. When maxInvestment
+    is given, each allocation is capped and the excess is redistributed to
+    the remaining signals (see allocateCapitalCapped)
     
     Args:
         buySignals: dict mapping ticker to signal data:
                     {ticker: {'iv': float, 'price': float, 'wpp': float, ...}, ...}
         totalCapital: available cash for allocation
+        maxInvestment: optional dict mapping ticker to max amount it may receive
     
     Returns:
         Dict mapping ticker to allocated amount: {ticker: float, ...}
@@ -319,10 +608,198 @@ def allocateCapitalByWPP(
     if totalWpp <= 0:
         return {}
     
+    if maxInvestment is not None:
+        tickers = list(wppDict)
+        capped = allocateCapitalCapped(
+            np.array([wppDict[t] for t in tickers], dtype=float),
+            np.array([maxInvestment.get(t, 0) for t in tickers], dtype=float),
+            totalCapital
+        )
+        return dict(zip(tickers, capped.tolist()))
+    
     # Allocate capital proportionally to WPP
     allocations = {}
     for ticker, wpp in wppDict.items():
         allocationPct = (wpp / totalWpp) * 100
         allocations[ticker] = (allocationPct / 100) * totalCapital
     
-    return allocations
\ No newline at end of file
+    return allocations
+
+def calculateMaxInvestment(
+    strategicWeights: np.ndarray,
+    positionValues: np.ndarray,
+    totalPortfolioValue,
+    multiplier: float = MAX_ALLOCATION_MULTIPLIER
+) -> np.ndarray:
+    """
+    Calculate how much more capital each stock may receive under the allocation cap
+    
+    Target Weight = SW / ΣSW
+    Max Allocation = Target Weight × multiplier × Total Portfolio Value
+    Max Investment = max(Max Allocation - Position Value, 0)
+    
+    Args:
+        strategicWeights: SW per ticker, shape (n,) or (batch, n)
+        positionValues: current position value per ticker, same shape
+        totalPortfolioValue: scalar or (batch,) portfolio value
+        multiplier: cap as a multiple of target weight (1.5 = 150%)
+    
+    Returns:
+        Array of remaining investment capacity per ticker
+    """
+    sw = np.asarray(strategicWeights, dtype=float)
+    values = np.asarray(positionValues, dtype=float)
+    total = np.asarray(totalPortfolioValue, dtype=float)[..., np.newaxis]
+    
+    swSum = sw.sum(axis=-1, keepdims=True)
+    targetWeights = np.divide(sw, swSum, out=np.zeros_like(sw), where=swSum > 0)
+    
+    return np.maximum(targetWeights * multiplier * total - values, 0.0)
+
+def allocateCapitalCapped(
+    wpp: np.ndarray,
+    maxInvestment: np.ndarray,
+    totalCapital
+) -> np.ndarray:
+    """
+    Capped Proportional Capital Distribution (water-filling)
+    
+    Finds the level λ such that Σ min(λ × WPP_i, Max_i) = Total Capital, which is
+    the fixed point of capping each stock and redistributing its excess to the
+    next best signals. Candidates are sorted by Max_i / WPP_i, so the solve is
+    O(n log n) instead of iterating redistribution rounds. If every candidate
+    hits its cap, the leftover capital stays unallocated.
+    
+    Args:
+        wpp: WPP per candidate, shape (n,) or (batch, n); WPP <= 0 gets nothing
+        maxInvestment: max amount per candidate, same shape as wpp (inf = uncapped)
+        totalCapital: available cash, scalar or (batch,)
+    
+    Returns:
+        Allocated amount per candidate, same shape as wpp (empty for no candidates)
+    """
+    wpp = np.asarray(wpp, dtype=float)
+    if wpp.shape[-1] == 0:
+        return np.zeros(wpp.shape)
+    
+    squeeze = wpp.ndim == 1
+    wpp = np.atleast_2d(wpp)
+    caps = np.broadcast_to(np.asarray(maxInvestment, dtype=float), wpp.shape)
+    capital = np.maximum(np.asarray(totalCapital, dtype=float), 0).reshape(-1, 1)
+    capital = np.broadcast_to(capital, (wpp.shape[0], 1))
+    
+    valid = (wpp > 0) & (caps > 0)
+    w = np.where(valid, wpp, 0.0)
+    c = np.where(valid, caps, 0.0)
+    ratio = np.where(valid, c / np.where(valid, w, 1.0), np.inf)
+    
+    # Sort by the level at which each candidate saturates
+    order = np.argsort(ratio, axis=1, kind='stable')
+    wSorted = np.take_along_axis(w, order, axis=1)
+    cSorted = np.take_along_axis(c, order, axis=1)
+    rSorted = np.take_along_axis(ratio, order, axis=1)
+    
+    # If the first k candidates are capped, the rest share the remainder at level λ_k
+    # Exclusive prefix sum, subtracting cSorted back would give inf - inf with uncapped candidates
+    cappedBefore = np.concatenate([np.zeros((wpp.shape[0], 1)), np.cumsum(cSorted, axis=1)[:, :-1]], axis=1)
+    weightFrom = np.cumsum(wSorted[:, ::-1], axis=1)[:, ::-1]
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        levels = (capital - cappedBefore) / weightFrom
+    
+    # λ_k is the solution at the first k where it doesn't exceed the k-th saturation level
+    feasible = (weightFrom > 0) & (levels <= rSorted)
+    rows = np.arange(wpp.shape[0])
+    level = np.where(feasible.any(axis=1), levels[rows, np.argmax(feasible, axis=1)], np.inf)
+    
+    with np.errstate(invalid='ignore'):
+        allocations = np.where(valid, np.minimum(level[:, np.newaxis] * w, c), 0.0)
+    
+    return allocations[0] if squeeze else allocations
+
+def calculateWSF(
+    intrinsicValue: np.ndarray,
+    currentPrice: np.ndarray,
+    strategicWeight: np.ndarray
+) -> np.ndarray:
+    """
+    Calculate Weighted Sell Factor (WSF)
+    
+    WSF = (Price / V)^k × (101 - SW) / 100
+    
+    Where k = 1 if Price >= V (overvalued), k = 2 if Price < V (quadratic shield)
+    
+    Args:
+        intrinsicValue: IV per ticker (NaN or <= 0 means unavailable)
+        currentPrice: current market price per ticker
+        strategicWeight: portfolio weight (1-100) per ticker
+    
+    Returns:
+        WSF array (higher = sold first), 0 where inputs are invalid
+    """
+    iv = np.asarray(intrinsicValue, dtype=float)
+    price = np.asarray(currentPrice, dtype=float)
+    sw = np.asarray(strategicWeight, dtype=float)
+    
+    valid = (iv > 0) & (price > 0)
+    ratio = np.where(valid, price / np.where(valid, iv, 1.0), 0.0)
+    exponent = np.where(ratio >= 1, 1, 2)
+    
+    return np.where(valid, ratio ** exponent * (101 - sw) / 100, 0.0)
+
+def liquidateByWSF(
+    intrinsicValue: np.ndarray,
+    currentPrice: np.ndarray,
+    strategicWeight: np.ndarray,
+    heldShares: np.ndarray,
+    targetCash
+) -> np.ndarray:
+    """
+    Proportional Liquidation Distribution (PLD)
+    
+    PLD = WSF / ΣWSF
+    Shares to Sell = ceil(PLD × Target Cash / Price), capped at shares held
+    
+    A stock capped at its shares held sells everything, and the cash it
+    couldn't raise is redistributed over the other stocks by their WSF,
+    until the target is met or every position is sold
+    
+    Args:
+        intrinsicValue: IV per ticker, shape (n,) or (batch, n)
+        currentPrice: current market price per ticker, same shape
+        strategicWeight: portfolio weight (1-100) per ticker, same shape
+        heldShares: shares currently held per ticker, same shape
+        targetCash: cash to raise, scalar or (batch,)
+    
+    Returns:
+        Integer array of shares to sell per ticker
+    """
+    price = np.asarray(currentPrice, dtype=float)
+    held = np.asarray(heldShares, dtype=float)
+    remaining = np.maximum(np.asarray(targetCash, dtype=float), 0)[..., np.newaxis]
+    
+    wsf = np.where(held > 0, calculateWSF(intrinsicValue, price, strategicWeight), 0.0)
+    active = wsf > 0
+    shares = np.zeros_like(held)
+    
+    # Each round either settles a row or sells out at least one more stock
+    for _ in range(held.shape[-1] + 1):
+        if not active.any():
+            break
+        
+        w = np.where(active, wsf, 0.0)
+        totalWsf = w.sum(axis=-1, keepdims=True)
+        pld = np.divide(w, totalWsf, out=np.zeros_like(w), where=totalWsf > 0)
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            wanted = np.where(pld > 0, np.ceil(pld * remaining / price), 0)
+        
+        soldOut = active & (wanted >= held)
+        settled = active & ~soldOut.any(axis=-1, keepdims=True)
+        
+        shares = np.where(settled, wanted, shares)
+        shares = np.where(soldOut, held, shares)
+        remaining = np.maximum(remaining - np.where(soldOut, held * price, 0.0).sum(axis=-1, keepdims=True), 0)
+        active &= ~(soldOut | settled)
+    
+    return shares.astype(np.int64)
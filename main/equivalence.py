@@ -0,0 +1,506 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from imports import *
+from backtesting import Backtester, EventDrivenBacktester, MIN_CASH_FOR_BUY
+from economics import (
+    setSelicData, calculateBuyPrice, calculateSellPrice,
+    generateTradingSignal, calculatePartialSellLevels, calculateWPP
+)
+
+import io
+import contextlib
+
+DEFAULT_ATOL = 0.01  # R$, tolerance mode
+COMPARED_TABLES = ['trades', 'dividends', 'equity_curve']
+
+class ScalarBacktester(Backtester):
+    """
+    Reference engine evaluating signals row by row with the scalar functions
+
+    Every day runs calculateIntrinsicValue, calculateBuyPrice/calculateSellPrice,
+    generateTradingSignal, calculatePartialSellLevels and calculateWPP per
+    ticker, the way Backtester did before the signal table, so the harness
+    also catches divergences of the vectorized signal stage
+    """
+
+    def _mergePriceData(self) -> pd.DataFrame:
+        self.merged = super()._mergePriceData()
+        return self.merged
+
+    def _buildSignalTable(self, merged: pd.DataFrame) -> None:
+        """No precomputed table, only fail early without SELIC coverage like Backtester"""
+        self._requireSelicCoverage()
+        return None
+
+    def _scalarSignals(self, dayIdx: int) -> Dict[str, Tuple[str, float, float]]:
+        """
+        Signal of every ticker with a price and an IV on a day
+
+        Returns:
+            {ticker: (signal, price, iv)}
+        """
+        row = self.merged.iloc[dayIdx]
+        date = row['Date']
+        signals = {}
+
+        for ticker in self.tracker.tickers:
+            if pd.isna(row.get(ticker)):
+                continue
+
+            currentPrice = float(row[ticker])
+            iv = self._getIV(ticker, date)
+            if iv is None or iv <= 0:
+                continue
+
+            buyPrice = calculateBuyPrice(iv, self.config['SAFETY_MARGIN'])
+            sellPrice = calculateSellPrice(iv, self.config['SAFETY_MARGIN'])
+            if not buyPrice or not sellPrice:
+                continue
+
+            signals[ticker] = (generateTradingSignal(currentPrice, iv, self.config['SAFETY_MARGIN']), currentPrice, iv)
+
+        return signals
+
+    def _levelIndex(self, iv: float, currentPrice: float) -> int:
+        """First partial sell level reached by the price, -1 if none"""
+        for idx, level in enumerate(calculatePartialSellLevels(iv, self.config['SAFETY_MARGIN'])):
+            if currentPrice >= level['trigger_price']:
+                return idx
+        return -1
+
+    def _evaluateTradingSignals(self, dayIdx: int, date: pd.Timestamp) -> Dict[str, Dict]:
+        # Python scalars, like the row values the original loop read
+        weights = dict(zip(self.portfolio['TICKER'].tolist(), self.portfolio['WEIGHT'].tolist()))
+        buySignals = {}
+
+        for ticker, (signal, currentPrice, iv) in self._scalarSignals(dayIdx).items():
+            if signal == 'SELL':
+                self._executeSell(ticker, date, currentPrice, iv, self._levelIndex(iv, currentPrice))
+
+            elif signal == 'BUY' and self.cash > currentPrice * MIN_CASH_FOR_BUY:
+                wpp = calculateWPP(iv, currentPrice, weights[ticker])
+
+                if wpp > 0:
+                    buySignals[ticker] = {
+                        'iv': iv,
+                        'price': currentPrice,
+                        'wpp': wpp,
+                        'buy_price': calculateBuyPrice(iv, self.config['SAFETY_MARGIN']),
+                    }
+
+        return buySignals
+
+    def _signalZones(self, dayIdx: int) -> Tuple[np.ndarray, np.ndarray]:
+        signals = self._scalarSignals(dayIdx)
+        zones = [signals.get(ticker, ('HOLD',))[0] for ticker in self.tracker.tickers]
+        return np.array([z == 'SELL' for z in zones]), np.array([z == 'BUY' for z in zones])
+
+def makeSyntheticDataset(
+    seed: int,
+    nTickers: int = 6,
+    startDate: str = '2008-01-01',
+    endDate: str = '2020-12-31',
+    sparse: bool = False
+) -> Dict:
+    """
+    Generate a random but realistic-looking dataset that exercises every code path
+
+    Prices wander around each stock's intrinsic value (roughly 8.7 × LPA), so
+    BUY zones, SELL zones at several partial-sell levels and dividend
+    reinvestments all occur.
+
+    With sparse=True prices instead revert to the IV and stay in the HOLD
+    zone, apart from a few short excursions into the BUY and SELL zones, and
+    SELIC barely moves. Most days have nothing to do, which exercises the
+    event-skipping paths.
+
+    Args:
+        seed: Random seed, the same seed always yields the same dataset
+        nTickers: Number of synthetic tickers
+        startDate, endDate: Price history range
+        sparse: Keep prices in the HOLD zone on most days
+
+    Returns:
+        Dict with 'portfolio', 'priceData', 'lpaData', 'profitData' and 'selic'
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(startDate, endDate)
+    years = list(range(dates[0].year - 10, dates[-1].year + 1))
+
+    tickers = [f'SYN{i}' for i in range(nTickers)]
+    portfolio = pd.DataFrame({'TICKER': tickers, 'WEIGHT': rng.integers(50, 100, nTickers)})
+
+    priceData, lpaData, profitData = {}, {}, {}
+    for ticker in tickers:
+        growth = rng.uniform(0.02, 0.15)
+        profits = 1e6 * (1 + growth) ** np.arange(len(years)) * rng.uniform(0.9, 1.1, len(years))
+        profitData[ticker] = pd.DataFrame({'TICKER': ticker, 'ANO': years, 'LUCRO LIQUIDO': profits.round(2)})
+
+        lpa = rng.uniform(0.5, 5.0) * (1 + growth) ** np.arange(len(years))
+        lpaData[ticker] = pd.DataFrame({'year': years, 'value': lpa.round(2)})
+
+        if sparse:
+            close = _sparsePrices(rng, dates, (8.5 + 2 * growth) * lpa[dates.year.to_numpy() - years[0]])
+            dividendChance = 0.004
+        else:
+            logReturns = rng.normal(0, 0.025, len(dates))
+            close = 8.7 * lpa[10] * rng.uniform(0.4, 1.6) * np.exp(np.cumsum(logReturns))
+            dividendChance = 0.016
+
+        dividends = np.where(rng.random(len(dates)) < dividendChance, close * rng.uniform(0.005, 0.02, len(dates)), 0.0)
+        priceData[ticker] = pd.DataFrame({'Date': dates, 'Close': close.round(2), 'Dividends': dividends.round(4)})
+
+    selicDates = pd.date_range(f'{years[0]}-01-01', endDate, freq='MS')
+    selic = pd.DataFrame({
+        'data': selicDates,
+        'valor': np.clip(10 + np.cumsum(rng.normal(0, 0.02 if sparse else 0.3, len(selicDates))), 2, 20).round(2),
+    })
+
+    return {
+        'portfolio': portfolio,
+        'priceData': priceData,
+        'lpaData': lpaData,
+        'profitData': profitData,
+        'selic': selic,
+    }
+
+def _sparsePrices(rng: np.random.Generator, dates: pd.DatetimeIndex, fairValue: np.ndarray) -> np.ndarray:
+    """Prices reverting to fairValue (about ±3%), with 4 short excursions to 0.4× or 1.8× of it"""
+    deviation = np.zeros(len(dates))
+    shocks = rng.normal(0, 0.01, len(dates))
+    for i in range(1, len(dates)):
+        deviation[i] = 0.95 * deviation[i - 1] + shocks[i]
+
+    factor = np.ones(len(dates))
+    for start in rng.integers(0, max(len(dates) - 15, 1), 4):
+        factor[start:start + int(rng.integers(5, 15))] = rng.choice([0.4, 1.8])
+
+    return fairValue * np.exp(deviation) * factor
+
+def loadRecordedDataset(fixtureDir: str, tickers: List[str], weights: Optional[List[float]] = None) -> Dict:
+    """
+    Load a dataset from recorded fixtures (see main/replay.py)
+
+    Args:
+        fixtureDir: Directory holding recorded fixtures
+        tickers: Tickers to load
+        weights: Strategic weights, defaults to 80 for every ticker
+
+    Returns:
+        Dataset dict in the makeSyntheticDataset() format
+    """
+    from replay import ReplayProvider
+
+    provider = ReplayProvider(fixtureDir)
+    return {
+        'portfolio': pd.DataFrame({'TICKER': tickers, 'WEIGHT': weights or [80] * len(tickers)}),
+        'priceData': {t: provider.getPrices(t) for t in tickers},
+        'lpaData': {t: provider.getLPA(t) for t in tickers},
+        'profitData': {t: provider.getProfits(t) for t in tickers},
+        'selic': provider.getSelic(),
+    }
+
+def defaultDatasets(seed: int) -> List[Dict]:
+    """Two dense synthetic datasets and a sparse one, where most days are quiet"""
+    return [makeSyntheticDataset(seed + i) for i in range(2)] + [makeSyntheticDataset(seed + 2, sparse=True)]
+
+def randomConfig(rng: np.random.Generator, dataset: Dict) -> Dict:
+    """
+    Draw a random backtest config inside the dataset's price history
+
+    Args:
+        rng: numpy random Generator
+        dataset: Dataset dict
+
+    Returns:
+        Configuration dict for Backtester
+    """
+    dates = next(iter(dataset['priceData'].values()))['Date']
+    first, last = dates.min(), dates.max()
+    span = (last - first).days
+
+    start = first + pd.Timedelta(days=int(rng.integers(0, span // 2)))
+    end = start + pd.Timedelta(days=int(rng.integers(365, max(span - (start - first).days, 366))))
+
+    config = {
+        'SAFETY_MARGIN': round(float(rng.uniform(0.2, 0.6)), 2),
+        'INITIAL_CAPITAL': int(rng.choice([10000, 50000, 250000])),
+        'START_DATE': start.strftime('%Y-%m-%d'),
+        'END_DATE': min(end, last).strftime('%Y-%m-%d'),
+    }
+    if rng.random() < 0.3:
+        config['MAX_DRIFT'] = round(float(rng.uniform(0.05, 0.15)), 2)
+
+    return config
+
+def runEngine(engine: type, config: Dict, dataset: Dict, useStrategy: bool = True) -> Tuple[Optional[Dict], float]:
+    """
+    Run one engine quietly and time it
+
+    Returns:
+        (results dict, elapsed seconds)
+    """
+    setSelicData(dataset['selic'])
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        bt = engine(config, dataset['portfolio'], dataset['priceData'], dataset['lpaData'], dataset['profitData'], useStrategy)
+        bt.backtest()
+        results = bt.getResults()
+        elapsed = time.perf_counter() - start
+
+    return results, elapsed
+
+def _rowMismatches(reference: pd.DataFrame, candidate: pd.DataFrame, mode: str, atol: float) -> np.ndarray:
+    """Boolean mask of the aligned rows that differ in any column"""
+    columns = list(dict.fromkeys(list(reference.columns) + list(candidate.columns)))
+    reference = reference.reindex(columns=columns).reset_index(drop=True)
+    candidate = candidate.reindex(columns=columns).reset_index(drop=True)
+
+    mismatch = np.zeros(len(reference), dtype=bool)
+    for column in columns:
+        a, b = reference[column], candidate[column]
+        bothMissing = (a.isna() & b.isna()).to_numpy()
+
+        if mode == 'tolerance' and pd.api.types.is_numeric_dtype(a) and pd.api.types.is_numeric_dtype(b):
+            equal = np.isclose(a.to_numpy(dtype=float), b.to_numpy(dtype=float), rtol=0, atol=atol)
+        else:
+            equal = (a == b).to_numpy()
+
+        mismatch |= ~(equal | bothMissing)
+
+    return mismatch
+
+def _firstDivergence(table: str, reference: pd.DataFrame, candidate: pd.DataFrame, mode: str, atol: float) -> Optional[Dict]:
+    """First differing row of one result table, or None if they match"""
+    reference = reference if reference is not None else pd.DataFrame()
+    candidate = candidate if candidate is not None else pd.DataFrame()
+    common = min(len(reference), len(candidate))
+
+    mismatches = np.flatnonzero(_rowMismatches(reference.iloc[:common], candidate.iloc[:common], mode, atol))
+    if mismatches.size > 0:
+        idx = int(mismatches[0])
+    elif len(reference) != len(candidate):
+        idx = common
+    else:
+        return None
+
+    refRow = reference.iloc[idx].to_dict() if idx < len(reference) else None
+    candRow = candidate.iloc[idx].to_dict() if idx < len(candidate) else None
+    row = refRow or candRow
+
+    return {
+        'table': table,
+        'row': idx,
+        'date': row.get('Date'),
+        'ticker': row.get('Ticker'),
+        'action': row.get('Action', 'EQUITY' if table == 'equity_curve' else 'DIVIDEND'),
+        'reference': refRow,
+        'candidate': candRow,
+    }
+
+def compareResults(reference: Optional[Dict], candidate: Optional[Dict], mode: str = 'exact', atol: float = DEFAULT_ATOL) -> Dict:
+    """
+    Compare two backtest results trade for trade
+
+    Args:
+        reference, candidate: Results dicts from getResults()
+        mode: 'exact' (bitwise equal values) or 'tolerance' (numeric |diff| <= atol)
+        atol: Absolute tolerance for 'tolerance' mode
+
+    Returns:
+        {'equal': bool, 'first': earliest divergence or None, 'divergences': per table}
+    """
+    if mode not in ('exact', 'tolerance'):
+        raise ValueError(f"Unknown comparison mode '{mode}', expected 'exact' or 'tolerance'")
+
+    if reference is None or candidate is None:
+        equal = reference is None and candidate is None
+        return {'equal': equal, 'first': None, 'divergences': {} if equal else {'results': 'one engine returned no results'}}
+
+    divergences = {}
+    for table in COMPARED_TABLES:
+        divergence = _firstDivergence(table, reference.get(table), candidate.get(table), mode, atol)
+        if divergence is not None:
+            divergences[table] = divergence
+
+    # Earliest divergent day across tables, trades before dividends before equity on ties
+    first = min(
+        divergences.values(),
+        key=lambda d: (pd.Timestamp(d['date']) if d['date'] is not None else pd.Timestamp.max, COMPARED_TABLES.index(d['table'])),
+        default=None
+    )
+
+    return {'equal': not divergences, 'first': first, 'divergences': divergences}
+
+def runEquivalence(
+    candidate: type = EventDrivenBacktester,
+    reference: type = ScalarBacktester,
+    datasets: Optional[List[Dict]] = None,
+    nConfigs: int = 10,
+    seed: int = 0,
+    mode: str = 'exact',
+    atol: float = DEFAULT_ATOL
+) -> List[Dict]:
+    """
+    Differential test of a candidate engine against the scalar reference engine
+
+    Every dataset is run with nConfigs random configs, in both strategy and
+    Buy & Hold modes
+
+    Args:
+        candidate: Engine class under test
+        reference: Reference engine class
+        datasets: Dataset dicts, defaults to defaultDatasets(seed)
+        nConfigs: Random configs per dataset
+        seed: Seed for configs (and default datasets)
+        mode: 'exact' or 'tolerance'
+        atol: Absolute tolerance for 'tolerance' mode
+
+    Returns:
+        One report per case: config, strategy flag, comparison and speedup
+    """
+    rng = np.random.default_rng(seed)
+    datasets = datasets or defaultDatasets(seed)
+
+    reports = []
+    for datasetIdx, dataset in enumerate(datasets):
+        for _ in range(nConfigs):
+            config = randomConfig(rng, dataset)
+
+            for useStrategy in (True, False):
+                refResults, refTime = runEngine(reference, config, dataset, useStrategy)
+                candResults, candTime = runEngine(candidate, config, dataset, useStrategy)
+
+                reports.append({
+                    'dataset': datasetIdx,
+                    'config': config,
+                    'useStrategy': useStrategy,
+                    'comparison': compareResults(refResults, candResults, mode, atol),
+                    'reference_seconds': refTime,
+                    'candidate_seconds': candTime,
+                    'speedup': refTime / candTime if candTime > 0 else float('inf'),
+                })
+
+    return reports
+
+def rebalanceChurn(results: Optional[Dict]) -> Dict:
+    """
+    Count rebalancing trades and the ones undoing a strategy trade of the same day
+
+    A REBALANCE_BUY after a SELL (or REBALANCE_SELL after a BUY) of the same
+    ticker on the same day is a reversal, the engine should never produce one
+
+    Args:
+        results: Results dict from getResults()
+
+    Returns:
+        {'rebalance_days', 'rebalance_trades', 'reversals'}
+    """
+    trades = results['trades'] if results is not None else pd.DataFrame()
+    if trades.empty:
+        return {'rebalance_days': 0, 'rebalance_trades': 0, 'reversals': 0}
+
+    rebalances = trades[trades['Action'].isin(['REBALANCE_BUY', 'REBALANCE_SELL'])]
+    undone = {'REBALANCE_BUY': 'SELL', 'REBALANCE_SELL': 'BUY'}
+    strategyTrades = set(zip(trades['Date'], trades['Ticker'], trades['Action']))
+
+    reversals = sum(
+        (date, ticker, undone[action]) in strategyTrades
+        for date, ticker, action in zip(rebalances['Date'], rebalances['Ticker'], rebalances['Action'])
+    )
+
+    return {
+        'rebalance_days': int(rebalances['Date'].nunique()),
+        'rebalance_trades': len(rebalances),
+        'reversals': int(reversals),
+    }
+
+def checkRebalancing(engine: type = Backtester, seeds: Tuple[int, ...] = (0, 1, 2, 3), maxDrift: float = 0.05) -> List[Dict]:
+    """
+    Run drift rebalancing on small synthetic portfolios and check it doesn't churn
+
+    Rebalancing must converge: no trade undoes the strategy's trades of the
+    same day and rebalancing only fires on a minority of the days
+
+    Args:
+        engine: Engine class under test
+        seeds: Synthetic dataset seeds (4 tickers, 2015-2016)
+        maxDrift: MAX_DRIFT of the runs
+
+    Returns:
+        One report per seed: churn counts, days and 'ok'
+    """
+    reports = []
+    for seed in seeds:
+        dataset = makeSyntheticDataset(seed, nTickers=4, startDate='2015-01-01', endDate='2016-12-31')
+        config = {
+            'SAFETY_MARGIN': 0.50,
+            'INITIAL_CAPITAL': 50000,
+            'START_DATE': '2015-01-01',
+            'END_DATE': '2016-12-31',
+            'MAX_DRIFT': maxDrift,
+        }
+
+        results, _ = runEngine(engine, config, dataset)
+        churn = rebalanceChurn(results)
+        days = len(results['equity_curve']) if results is not None else 0
+
+        churn.update({'seed': seed, 'days': days})
+        churn['ok'] = churn['reversals'] == 0 and churn['rebalance_days'] <= days / 2
+        reports.append(churn)
+
+    return reports
+
+def printReport(reports: List[Dict]) -> None:
+    """Print one line per case and the overall result"""
+    for report in reports:
+        comparison = report['comparison']
+        mode = 'STRAT' if report['useStrategy'] else 'HOLD '
+        status = 'OK  ' if comparison['equal'] else 'DIFF'
+        line = f"{status} | ds {report['dataset']} | {mode} | {report['config']['START_DATE']}..{report['config']['END_DATE']} | {report['speedup']:6.2f}x"
+
+        first = comparison['first']
+        if first is not None:
+            line += f" | first divergence: {first['table']} row {first['row']} {first['date']} {first['ticker'] or ''} {first['action']}"
+        print(line)
+
+    failures = sum(not r['comparison']['equal'] for r in reports)
+    speedups = [r['speedup'] for r in reports]
+    print(f"\n{len(reports) - failures}/{len(reports)} equivalent | median speedup {np.median(speedups):.2f}x")
+
+if __name__ == "__main__":
+    import argparse
+
+    engines = {'event': EventDrivenBacktester, 'table': Backtester}
+
+    parser = argparse.ArgumentParser(description='Check a backtest engine against the scalar reference engine')
+    parser.add_argument('--engine', choices=list(engines), default='event', help='Engine under test')
+    parser.add_argument('--configs', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--mode', choices=['exact', 'tolerance'], default='exact')
+    parser.add_argument('--atol', type=float, default=DEFAULT_ATOL)
+    parser.add_argument('--fixtures', help='Recorded fixture directory to test on as well')
+    parser.add_argument('--tickers', nargs='*', default=[], help='Tickers to load from --fixtures')
+    parser.add_argument('--rebalance', action='store_true', help='Check that drift rebalancing converges instead')
+    args = parser.parse_args()
+
+    if args.rebalance:
+        churnReports = checkRebalancing(engines[args.engine])
+        for churn in churnReports:
+            status = 'OK  ' if churn['ok'] else 'FAIL'
+            print(f"{status} | seed {churn['seed']} | rebalanced on {churn['rebalance_days']}/{churn['days']} days | {churn['rebalance_trades']} trades | {churn['reversals']} reversals")
+        sys.exit(0 if all(c['ok'] for c in churnReports) else 1)
+
+    datasets = defaultDatasets(args.seed)
+    if args.fixtures:
+        datasets.append(loadRecordedDataset(args.fixtures, args.tickers))
+
+    reports = runEquivalence(engines[args.engine], datasets=datasets, nConfigs=args.configs, seed=args.seed, mode=args.mode, atol=args.atol)
+    printReport(reports)
+
+    if not all(r['comparison']['equal'] for r in reports):
+        sys.exit(1)
@@ -0,0 +1,196 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from imports import *
+
+DEFAULT_OUTPUT_DIR = 'results'
+DEFAULT_COMPRESSION = 'zstd'
+
+# Tables of the result dataset, each partitioned by run_id (hive layout):
+#   <outputDir>/<table>/run_id=<runId>/part-0.<ext>
+EXPORT_TABLES = {
+    'equity': 'equity_curve',
+    'trades': 'trades',
+    'dividends': 'dividends',
+}
+RUNS_TABLE = 'runs'
+FORMAT_EXTENSIONS = {'parquet': 'parquet', 'arrow': 'arrow', 'csv': 'csv'}
+
+def _requirePyarrow():
+    """Import pyarrow on demand, only the Parquet/Arrow formats need it"""
+    try:
+        import pyarrow
+        import pyarrow.dataset
+        import pyarrow.parquet
+        import pyarrow.ipc
+    except ImportError as e:
+        raise ImportError("Parquet/Arrow export requires pyarrow (pip install pyarrow), or use format='csv'") from e
+    return pyarrow
+
+def hasPyarrow() -> bool:
+    """Whether pyarrow is installed, i.e. the Parquet/Arrow formats are available"""
+    try:
+        import pyarrow
+    except ImportError:
+        return False
+    return True
+
+def defaultFormat() -> str:
+    """'parquet' when pyarrow is installed, 'csv' otherwise"""
+    return 'parquet' if hasPyarrow() else 'csv'
+
+def _partitionPath(outputDir: str, table: str, runId: str, fmt: str) -> str:
+    return os.path.join(outputDir, table, f'run_id={runId}', f'part-0.{FORMAT_EXTENSIONS[fmt]}')
+
+def _writeTable(df: pd.DataFrame, path: str, fmt: str, compression: str) -> None:
+    """Write one partition file in the requested format"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    if fmt == 'csv':
+        df.to_csv(path, index=False)
+        return
+
+    pa = _requirePyarrow()
+    table = pa.Table.from_pandas(df, preserve_index=False)
+
+    if fmt == 'parquet':
+        pa.parquet.write_table(table, path, compression=compression)
+    else:
+        options = pa.ipc.IpcWriteOptions(compression=compression)
+        with pa.ipc.new_file(path, table.schema, options=options) as writer:
+            writer.write_table(table)
+
+def exportRun(
+    results: Dict,
+    runId: str,
+    outputDir: str = DEFAULT_OUTPUT_DIR,
+    config: Optional[Dict] = None,
+    metadata: Optional[Dict] = None,
+    format: Optional[str] = None,
+    compression: str = DEFAULT_COMPRESSION
+) -> None:
+    """
+    Export a full backtest result set into the run-partitioned dataset
+
+    Writes equity curve, trades, dividends and a one-row 'runs' table with
+    the config, summary values and any extra metadata
+
+    Args:
+        results: Results dict from Backtester.getResults()
+        runId: Unique run identifier, used as the partition key
+        outputDir: Dataset root directory
+        config: Configuration dict of the run
+        metadata: Extra run metadata (e.g. strategy name, engine version)
+        format: 'parquet', 'arrow' (IPC) or 'csv', defaults to defaultFormat()
+        compression: Codec for parquet/arrow ('zstd', 'lz4', 'snappy', ...)
+    """
+    format = format or defaultFormat()
+    if format not in FORMAT_EXTENSIONS:
+        raise ValueError(f"Unknown export format '{format}', expected one of {list(FORMAT_EXTENSIONS)}")
+
+    for table, key in EXPORT_TABLES.items():
+        df = results.get(key)
+        # Empty tables (e.g. no trades) are skipped, readers treat them as missing
+        if df is None or df.empty:
+            continue
+        _writeTable(df, _partitionPath(outputDir, table, runId, format), format, compression)
+
+    run = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'config': json.dumps(config or {}, sort_keys=True, default=str),
+        'final_equity': float(results['final_equity']),
+        'total_return': float(results['total_return']),
+        'total_dividends': float(results['total_dividends']),
+        'num_trades': int(results['num_trades']),
+    }
+    run.update(metadata or {})
+    _writeTable(pd.DataFrame([run]), _partitionPath(outputDir, RUNS_TABLE, runId, format), format, compression)
+
+def openDataset(outputDir: str = DEFAULT_OUTPUT_DIR, table: str = 'equity', format: str = 'parquet'):
+    """
+    Open one table of the result dataset lazily (no data is read yet)
+
+    Schemas are unified across runs, since e.g. trades columns depend on
+    which actions a run produced
+
+    Args:
+        outputDir: Dataset root directory
+        table: 'equity', 'trades', 'dividends' or 'runs'
+        format: 'parquet' or 'arrow'
+
+    Returns:
+        pyarrow.dataset.Dataset with a string 'run_id' partition column
+    """
+    pa = _requirePyarrow()
+    ds = pa.dataset
+
+    path = os.path.join(outputDir, table)
+    dsFormat = 'ipc' if format == 'arrow' else format
+    partitioning = ds.partitioning(pa.schema([('run_id', pa.string())]), flavor='hive')
+
+    dataset = ds.dataset(path, format=dsFormat, partitioning=partitioning)
+    schemas = [fragment.physical_schema for fragment in dataset.get_fragments()]
+    schemas.append(partitioning.schema)
+
+    try:
+        schema = pa.unify_schemas(schemas, promote_options='permissive')
+    except TypeError:
+        schema = pa.unify_schemas(schemas)
+
+    return ds.dataset(path, schema=schema, format=dsFormat, partitioning=partitioning)
+
+def loadRuns(
+    outputDir: str = DEFAULT_OUTPUT_DIR,
+    table: str = 'equity',
+    columns: Optional[List[str]] = None,
+    runIds: Optional[List[str]] = None,
+    format: Optional[str] = None
+) -> pd.DataFrame:
+    """
+    Load a table for many runs, reading only the requested columns and partitions
+
+    Args:
+        outputDir: Dataset root directory
+        table: 'equity', 'trades', 'dividends' or 'runs'
+        columns: Columns to read (None = all); 'run_id' is always included
+        runIds: Runs to read (None = all)
+        format: 'parquet', 'arrow' or 'csv', defaults to defaultFormat()
+
+    Returns:
+        DataFrame with a 'run_id' column
+    """
+    format = format or defaultFormat()
+    if columns is not None and 'run_id' not in columns:
+        columns = ['run_id'] + list(columns)
+
+    if format == 'csv':
+        return _loadCsvRuns(outputDir, table, columns, runIds)
+
+    pa = _requirePyarrow()
+    dataset = openDataset(outputDir, table, format)
+    runFilter = pa.dataset.field('run_id').isin(runIds) if runIds is not None else None
+
+    return dataset.to_table(columns=columns, filter=runFilter).to_pandas()
+
+def _loadCsvRuns(
+    outputDir: str,
+    table: str,
+    columns: Optional[List[str]],
+    runIds: Optional[List[str]]
+) -> pd.DataFrame:
+    """CSV fallback of loadRuns(), one pandas read per partition"""
+    frames = []
+    for path in sorted(glob.glob(os.path.join(outputDir, table, 'run_id=*', 'part-0.csv'))):
+        runId = os.path.basename(os.path.dirname(path))[len('run_id='):]
+        if runIds is not None and runId not in runIds:
+            continue
+
+        usecols = (lambda c: c in columns) if columns is not None else None
+        df = pd.read_csv(path, usecols=usecols)
+        if 'Date' in df.columns:
+            df['Date'] = pd.to_datetime(df['Date'])
+        df.insert(0, 'run_id', runId)
+        frames.append(df)
+
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
@@ -0,0 +1,121 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from imports import *
+
+MAX_DRIFT = 0.05  # Rebalance when any stock drifts more than 5% from its target weight
+
+class PortfolioTracker:
+    def __init__(self, tickers: List[str], strategicWeights: List[float]):
+        """
+        Incremental portfolio valuation and drift monitor
+
+        Keeps shares, last prices and per-ticker values as arrays and updates
+        the total market value from deltas, so a position or price change
+        costs O(changed tickers) instead of revaluing the whole portfolio.
+        Unavailable prices (NaN) value the position at 0 for that day.
+
+        Args:
+            tickers: Portfolio tickers, defines the array order
+            strategicWeights: SW per ticker (1-100), same order as tickers
+        """
+        self.tickers = list(tickers)
+        self.index = {ticker: i for i, ticker in enumerate(self.tickers)}
+
+        sw = np.asarray(strategicWeights, dtype=float)
+        self.targetWeights = sw / sw.sum() if sw.sum() > 0 else np.zeros_like(sw)
+
+        self.shares = np.zeros(len(self.tickers))
+        self.prices = np.zeros(len(self.tickers))
+        self.values = np.zeros(len(self.tickers))
+        self.marketValue = 0.0
+
+    def setPosition(self, ticker: str, shares: float) -> None:
+        """
+        Set the shares held for a ticker
+
+        Args:
+            ticker: Stock ticker
+            shares: New share count (0 closes the position)
+        """
+        i = self.index[ticker]
+        newValue = shares * self.prices[i]
+
+        self.marketValue += newValue - self.values[i]
+        self.values[i] = newValue
+        self.shares[i] = shares
+
+    def updatePrices(self, prices: Dict[str, float]) -> None:
+        """
+        Apply price changes for a subset of tickers
+
+        Args:
+            prices: dict mapping ticker -> new price (NaN = unavailable)
+        """
+        for ticker, price in prices.items():
+            i = self.index[ticker]
+            price = 0.0 if pd.isna(price) else price
+            newValue = self.shares[i] * price
+
+            self.marketValue += newValue - self.values[i]
+            self.values[i] = newValue
+            self.prices[i] = price
+
+    def syncPrices(self, prices: np.ndarray) -> None:
+        """
+        Sync a full price vector, only tickers whose price changed are revalued
+
+        The total is then recomputed from the values, which costs the same as
+        the price comparison and makes it independent of how many syncs ran
+        before (an engine skipping quiet days sees the same total)
+
+        Args:
+            prices: Prices in tracker ticker order (NaN = unavailable)
+        """
+        prices = np.nan_to_num(np.asarray(prices, dtype=float), nan=0.0)
+        changed = np.flatnonzero(prices != self.prices)
+
+        if changed.size > 0:
+            self.values[changed] = self.shares[changed] * prices[changed]
+            self.prices[changed] = prices[changed]
+
+        self.marketValue = float(self.values.sum())
+
+    def weights(self) -> np.ndarray:
+        """
+        Current Weight = Position Value / Total Portfolio Value
+
+        Returns:
+            Array of current weights (as decimals) in tracker ticker order
+        """
+        if self.marketValue <= 0:
+            return np.zeros_like(self.values)
+        return self.values / self.marketValue
+
+    def drift(self) -> np.ndarray:
+        """
+        Drift = Current Weight - Target Weight
+
+        Returns:
+            Array of drifts (as decimals) in tracker ticker order
+        """
+        return self.weights() - self.targetWeights
+
+    def maxDrift(self) -> float:
+        """Max Drift = max(|Drift|) across all stocks"""
+        if self.marketValue <= 0:
+            return 0.0
+        return float(np.abs(self.drift()).max())
+
+    def needsRebalance(self, threshold: float = MAX_DRIFT) -> bool:
+        """
+        Check the rebalancing trigger
+
+        Args:
+            threshold: Max Drift allowed before rebalancing (0.05 = 5%)
+
+        Returns:
+            True if Max Drift > threshold
+        """
+        return self.maxDrift() > threshold
@@ -0,0 +1,292 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from imports import *
+
+# Heavy dependencies (yfinance, selenium, requests, tenacity) are imported inside
+# the provider that needs them, so the backtest-only path never pays for them.
+
+RETRY_ATTEMPTS = 3
+SELIC_URL = 'https://api.bcb.gov.br/dados/serie/bcdata.sgs.4189/dados?formato=json'
+SELIC_MAX_WINDOW_YEARS = 10  # BCB SGS rejects date ranges longer than 10 years
+SELIC_SERIES_START = '1986-07-01'  # First observation of series 4189, start of unbounded queries
+LPA_FULL_HISTORY_YEARS = 30  # StatusInvest 'time' used when the window has no start
+
+# Only the columns the engine reads are kept
+PRICE_COLUMNS = ['Date', 'Close', 'Dividends']
+
+def filterDates(df: pd.DataFrame, column: str, start=None, end=None) -> pd.DataFrame:
+    """
+    Keep rows whose date column lies within [start, end] (None = unbounded)
+
+    Args:
+        df: DataFrame to filter
+        column: Datetime column name
+        start, end: Window bounds (anything pd.Timestamp accepts)
+    """
+    if df.empty or (start is None and end is None):
+        return df
+
+    mask = pd.Series(True, index=df.index)
+    if start is not None:
+        mask &= df[column] >= pd.Timestamp(start)
+    if end is not None:
+        mask &= df[column] <= pd.Timestamp(end)
+    return df[mask].reset_index(drop=True)
+
+def filterYears(df: pd.DataFrame, column: str, start=None, end=None) -> pd.DataFrame:
+    """
+    Keep rows whose year column lies within [start.year, end.year] (None = unbounded)
+
+    Args:
+        df: DataFrame to filter
+        column: Integer year column name
+        start, end: Window bounds (anything pd.Timestamp accepts)
+    """
+    if df.empty or (start is None and end is None):
+        return df
+
+    mask = pd.Series(True, index=df.index)
+    if start is not None:
+        mask &= df[column] >= pd.Timestamp(start).year
+    if end is not None:
+        mask &= df[column] <= pd.Timestamp(end).year
+    return df[mask].reset_index(drop=True)
+
+def withRetry(func, *args, **kwargs):
+    """
+    Call func with exponential backoff retries (tenacity loaded on first use)
+
+    Args:
+        func: Callable to retry
+        *args, **kwargs: Arguments forwarded to func
+
+    Returns:
+        func's return value
+    """
+    from tenacity import retry, stop_after_attempt, wait_exponential
+
+    retrying = retry(stop=stop_after_attempt(RETRY_ATTEMPTS), wait=wait_exponential(multiplier=1, min=1, max=3))
+    return retrying(func)(*args, **kwargs)
+
+def setupSelenium():
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+
+    options = webdriver.ChromeOptions()
+
+    options.add_argument('user-agent=Mozilla/5.0 (Macintosh; Intel Mac OS X 10_13) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/111.0.8191.896 Safari/537.36')
+    options.add_argument('--headless')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    options.add_argument('--disable-gpu')
+    options.add_argument('--disable-images')
+    options.add_argument('--blink-settings=imagesEnabled=false')
+
+    driver = webdriver.Chrome(
+        options=options,
+        service=Service(log_output=os.devnull),
+    )
+    driver.implicitly_wait(3)
+    return driver
+
+class DataProvider:
+    """
+    Interface for a market data source
+
+    A provider only implements the fetch methods for the data it serves,
+    the rest raise NotImplementedError. start/end bound the returned history
+    (None = everything available), providers should push them down to the
+    source whenever it supports it.
+    """
+
+    def getPrices(self, ticker: str, start=None, end=None) -> pd.DataFrame:
+        """Price history with PRICE_COLUMNS ('Date', 'Close', 'Dividends')"""
+        raise NotImplementedError(f'{type(self).__name__} does not provide prices')
+
+    def getLPA(self, ticker: str, start=None, end=None) -> pd.DataFrame:
+        """LPA history with 'year' and 'value' columns"""
+        raise NotImplementedError(f'{type(self).__name__} does not provide LPA')
+
+    def getProfits(self, ticker: str, start=None, end=None) -> pd.DataFrame:
+        """Liquid profit history with 'TICKER', 'ANO' and 'LUCRO LIQUIDO' columns"""
+        raise NotImplementedError(f'{type(self).__name__} does not provide profits')
+
+    def getSelic(self, start=None, end=None) -> pd.DataFrame:
+        """SELIC history with 'data' (datetime) and 'valor' (float, %) columns"""
+        raise NotImplementedError(f'{type(self).__name__} does not provide SELIC')
+
+class YFinanceProvider(DataProvider):
+    def getPrices(self, ticker: str, start=None, end=None) -> pd.DataFrame:
+        return withRetry(self._fetchPrices, ticker, start, end)
+
+    def _fetchPrices(self, ticker: str, start=None, end=None) -> pd.DataFrame:
+        import yfinance as yf
+
+        if start is None and end is None:
+            history = yf.Ticker(f'{ticker}.SA').history(period='max')
+        else:
+            # yfinance's end is exclusive
+            history = yf.Ticker(f'{ticker}.SA').history(
+                start=pd.Timestamp(start).strftime('%Y-%m-%d') if start is not None else None,
+                end=(pd.Timestamp(end) + pd.Timedelta(days=1)).strftime('%Y-%m-%d') if end is not None else None,
+            )
+
+        df = history.reset_index()[PRICE_COLUMNS]
+        df['Date'] = pd.to_datetime(df['Date'].dt.strftime('%Y-%m-%d'))
+        return df
+
+class StatusInvestProvider(DataProvider):
+    def getLPA(self, ticker: str, start=None, end=None) -> pd.DataFrame:
+        # The endpoint only takes a coarse 'time' range, so years are trimmed client-side
+        return filterYears(withRetry(self._fetchLPA, ticker, start, end), 'year', start, end)
+
+    def _fetchLPA(self, ticker: str, start=None, end=None) -> pd.DataFrame:
+        # 'time' counts years back from today, so it must reach the window's start
+        years = LPA_FULL_HISTORY_YEARS if start is None else max(pd.Timestamp.today().year - pd.Timestamp(start).year + 1, 1)
+
+        driver = setupSelenium()
+        driver.get(f'https://statusinvest.com.br/acoes/{ticker}')
+
+        script = f"""
+        var callback = arguments[arguments.length - 1];
+        fetch('/acao/indicatorhistoricallist', {{
+            method: 'POST',
+            headers: {{'Content-Type': 'application/x-www-form-urlencoded; charset=UTF-8', 'X-Requested-With': 'XMLHttpRequest'}},
+            body: 'codes%5B%5D={ticker.lower()}&time={years}&byQuarter=false&futureData=false'
+        }})
+        .then(r => r.json())
+        .then(data => callback(data))
+        .catch(e => callback(null));
+        """
+
+        try:
+            data = driver.execute_async_script(script)
+            if data and ticker.lower() in data.get('data', {}):
+                lpaData = next((ind.get('ranks', []) for ind in data['data'][ticker.lower()] if ind.get('key') == 'lpa'), [])
+                df = pd.json_normalize(lpaData)
+                if not df.empty:
+                    return df[['rank', 'value']].rename(columns={'rank': 'year'})
+        except:
+            pass
+        finally:
+            driver.quit()
+
+        return pd.DataFrame()
+
+class StocksAPIProvider(DataProvider):
+    def __init__(self, baseUrl: Optional[str] = None):
+        """
+        Mansa Stocks API provider
+
+        Args:
+            baseUrl: API root, defaults to http://STOCKSAPI_HOST:STOCKSAPI_PORT
+        """
+        self.baseUrl = baseUrl or f'http://{Config.STOCKS_API["HOST"]}:{Config.STOCKS_API["PORT"]}'
+
+    def health(self, timeout: float = 5) -> Tuple[int, float]:
+        """
+        Query the /health endpoint
+
+        Returns:
+            (status_code, latency in ms)
+        """
+        import requests
+
+        startTime = time.time()
+        response = requests.get(f'{self.baseUrl}/health', timeout=timeout)
+        return response.status_code, (time.time() - startTime) * 1000
+
+    def getProfits(self, ticker: str, start=None, end=None) -> pd.DataFrame:
+        return filterYears(withRetry(self._fetchProfits, ticker), 'ANO', start, end)
+
+    def _fetchProfits(self, ticker: str) -> pd.DataFrame:
+        import requests
+
+        try:
+            response = requests.get(f'{self.baseUrl}/api/historical?search={ticker}&fields=LUCRO%20LIQUIDO')
+            if response.status_code != 200:
+                return pd.DataFrame()
+
+            data = response.json()['data'][0]
+            rows = []
+            for key, value in data.items():
+                if key.startswith('LUCRO LIQUIDO') and value:
+                    try:
+                        year = int(key.split()[-1])
+                        rows.append({'TICKER': data['TICKER'], 'ANO': year, 'LUCRO LIQUIDO': value})
+                    except (ValueError, IndexError):
+                        continue
+
+            return pd.DataFrame(rows).sort_values('ANO') if rows else pd.DataFrame()
+        except:
+            return pd.DataFrame()
+
+class BCBProvider(DataProvider):
+    def __init__(self, url: str = SELIC_URL):
+        """
+        Banco Central do Brasil SGS provider (series 4189, SELIC)
+
+        Args:
+            url: SGS series endpoint returning JSON
+        """
+        self.url = url
+
+    def getSelic(self, start=None, end=None) -> pd.DataFrame:
+        # Every query, unbounded ones too, is split into windows the API accepts
+        start = pd.Timestamp(start if start is not None else SELIC_SERIES_START)
+        end = pd.Timestamp(end) if end is not None else pd.Timestamp.today().normalize()
+
+        chunks = []
+        while start <= end:
+            chunkEnd = min(start + pd.DateOffset(years=SELIC_MAX_WINDOW_YEARS) - pd.Timedelta(days=1), end)
+            chunks.append(withRetry(self._fetchSelic, start, chunkEnd))
+            start = chunkEnd + pd.Timedelta(days=1)
+
+        selicDf = pd.concat(chunks, ignore_index=True).drop_duplicates('data')
+        return selicDf.sort_values('data').reset_index(drop=True)
+
+    def _fetchSelic(self, start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
+        import requests
+
+        params = {
+            'dataInicial': start.strftime('%d/%m/%Y'),
+            'dataFinal': end.strftime('%d/%m/%Y'),
+        }
+        response = requests.get(self.url, params=params)
+        selicDf = pd.DataFrame(response.json(), columns=['data', 'valor'])
+        selicDf['data'] = pd.to_datetime(selicDf['data'], format='%d/%m/%Y')
+        selicDf['valor'] = selicDf['valor'].astype('float64')
+        return selicDf.sort_values('data').reset_index(drop=True)
+
+# Active provider per data kind, swap with setProvider() (e.g. for cached or replayed data)
+PROVIDERS: Dict[str, DataProvider] = {
+    'price': YFinanceProvider(),
+    'lpa': StatusInvestProvider(),
+    'profit': StocksAPIProvider(),
+    'selic': BCBProvider(),
+}
+
+def getProvider(kind: str) -> DataProvider:
+    """
+    Get the active provider for a data kind
+
+    Args:
+        kind: 'price', 'lpa', 'profit' or 'selic'
+    """
+    if kind not in PROVIDERS:
+        raise KeyError(f"Unknown data kind '{kind}', expected one of {list(PROVIDERS)}")
+    return PROVIDERS[kind]
+
+def setProvider(kind: str, provider: DataProvider) -> None:
+    """
+    Replace the active provider for a data kind
+
+    Args:
+        kind: 'price', 'lpa', 'profit' or 'selic'
+        provider: DataProvider implementing the matching fetch method
+    """
+    if kind not in PROVIDERS:
+        raise KeyError(f"Unknown data kind '{kind}', expected one of {list(PROVIDERS)}")
+    PROVIDERS[kind] = provider
@@ -0,0 +1,329 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from imports import *
+from providers import DataProvider, StocksAPIProvider, BCBProvider, PRICE_COLUMNS, filterDates, filterYears, getProvider, setProvider
+
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, urlencode
+from urllib.request import urlopen
+
+DEFAULT_FIXTURE_DIR = 'fixtures'
+SELIC_PATH = '/dados/serie/bcdata.sgs.4189/dados'
+
+# Fixture layout: one CSV per ticker and data kind, plus the SELIC series
+FIXTURE_FILES = {
+    'price': os.path.join('prices', '{ticker}.csv'),
+    'lpa': os.path.join('lpa', '{ticker}.csv'),
+    'profit': os.path.join('profit', '{ticker}.csv'),
+    'selic': 'selic.csv',
+}
+DATE_COLUMNS = {'price': ['Date'], 'lpa': [], 'profit': [], 'selic': ['data']}
+
+def fixturePath(fixtureDir: str, kind: str, ticker: str = '') -> str:
+    """Path of the fixture file for a data kind (and ticker)"""
+    return os.path.join(fixtureDir, FIXTURE_FILES[kind].format(ticker=ticker))
+
+def writeFixture(fixtureDir: str, kind: str, df: pd.DataFrame, ticker: str = '') -> None:
+    """
+    Save a provider response as a fixture
+
+    Args:
+        fixtureDir: Fixture root directory
+        kind: 'price', 'lpa', 'profit' or 'selic'
+        df: DataFrame returned by the live provider
+        ticker: Stock ticker (empty for SELIC)
+    """
+    path = fixturePath(fixtureDir, kind, ticker)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    df.to_csv(path, index=False)
+
+def readFixture(fixtureDir: str, kind: str, ticker: str = '') -> pd.DataFrame:
+    """
+    Load a recorded fixture
+
+    Args:
+        fixtureDir: Fixture root directory
+        kind: 'price', 'lpa', 'profit' or 'selic'
+        ticker: Stock ticker (empty for SELIC)
+
+    Returns:
+        Recorded DataFrame (empty if the recorded response was empty)
+
+    Raises:
+        FileNotFoundError: if nothing was recorded for this kind/ticker
+    """
+    path = fixturePath(fixtureDir, kind, ticker)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No '{kind}' fixture recorded for '{ticker or kind}' in {fixtureDir}")
+
+    try:
+        return pd.read_csv(path, parse_dates=DATE_COLUMNS[kind])
+    except pd.errors.EmptyDataError:
+        return pd.DataFrame()
+
+class RecordingProvider(DataProvider):
+    def __init__(self, fixtureDir: str = DEFAULT_FIXTURE_DIR, providers: Optional[Dict[str, DataProvider]] = None):
+        """
+        Pass-through provider that records every response as a fixture
+
+        Args:
+            fixtureDir: Directory to write fixtures to
+            providers: Live providers per data kind, defaults to the active ones
+        """
+        self.fixtureDir = fixtureDir
+        self.providers = providers or {kind: getProvider(kind) for kind in FIXTURE_FILES}
+
+    def getPrices(self, ticker: str, start=None, end=None) -> pd.DataFrame:
+        df = self.providers['price'].getPrices(ticker, start, end)
+        writeFixture(self.fixtureDir, 'price', df, ticker)
+        return df
+
+    def getLPA(self, ticker: str, start=None, end=None) -> pd.DataFrame:
+        df = self.providers['lpa'].getLPA(ticker, start, end)
+        writeFixture(self.fixtureDir, 'lpa', df, ticker)
+        return df
+
+    def getProfits(self, ticker: str, start=None, end=None) -> pd.DataFrame:
+        df = self.providers['profit'].getProfits(ticker, start, end)
+        writeFixture(self.fixtureDir, 'profit', df, ticker)
+        return df
+
+    def getSelic(self, start=None, end=None) -> pd.DataFrame:
+        df = self.providers['selic'].getSelic(start, end)
+        writeFixture(self.fixtureDir, 'selic', df)
+        return df
+
+class ReplayProvider(DataProvider):
+    def __init__(self, fixtureDir: str = DEFAULT_FIXTURE_DIR, latency: float = 0.0):
+        """
+        In-process provider serving recorded fixtures
+
+        Args:
+            fixtureDir: Directory holding recorded fixtures
+            latency: Artificial delay per call in seconds, to mimic network I/O
+        """
+        self.fixtureDir = fixtureDir
+        self.latency = latency
+
+    def _replay(self, kind: str, ticker: str = '') -> pd.DataFrame:
+        if self.latency > 0:
+            time.sleep(self.latency)
+        return readFixture(self.fixtureDir, kind, ticker)
+
+    def getPrices(self, ticker: str, start=None, end=None) -> pd.DataFrame:
+        df = self._replay('price', ticker)
+        return filterDates(df[[c for c in PRICE_COLUMNS if c in df.columns]], 'Date', start, end)
+
+    def getLPA(self, ticker: str, start=None, end=None) -> pd.DataFrame:
+        return filterYears(self._replay('lpa', ticker), 'year', start, end)
+
+    def getProfits(self, ticker: str, start=None, end=None) -> pd.DataFrame:
+        return filterYears(self._replay('profit', ticker), 'ANO', start, end)
+
+    def getSelic(self, start=None, end=None) -> pd.DataFrame:
+        return filterDates(self._replay('selic'), 'data', start, end)
+
+class ReplayServer:
+    def __init__(
+        self,
+        fixtureDir: str = DEFAULT_FIXTURE_DIR,
+        host: str = '127.0.0.1',
+        port: int = 0,
+        latency: float = 0.0
+    ):
+        """
+        Local HTTP stand-in for the Stocks API, BCB and price/LPA sources
+
+        Serves recorded fixtures with the same response shapes as the live
+        endpoints, one thread per request so concurrent loading can be
+        benchmarked:
+            GET /health
+            GET /api/historical?search=TICKER&fields=LUCRO%20LIQUIDO   (Stocks API)
+            GET /dados/serie/bcdata.sgs.4189/dados?formato=json        (BCB SELIC)
+            GET /prices/TICKER, GET /lpa/TICKER                        (JSON records,
+                                                                        optional start/end)
+
+        Args:
+            fixtureDir: Directory holding recorded fixtures
+            host: Interface to bind
+            port: Port to bind (0 = any free port)
+            latency: Artificial delay per request in seconds
+        """
+        self.fixtureDir = fixtureDir
+        self.latency = latency
+        self.httpd = ThreadingHTTPServer((host, port), self._makeHandler())
+        self.httpd.daemon_threads = True
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> 'ReplayServer':
+        """Serve in a background thread"""
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self.thread is not None:
+            self.thread.join()
+
+    def __enter__(self) -> 'ReplayServer':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _makeHandler(self):
+        server = self
+
+        class ReplayHandler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, payload) -> None:
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if server.latency > 0:
+                    time.sleep(server.latency)
+
+                parsed = urlparse(self.path)
+                query = parse_qs(parsed.query)
+                parts = [p for p in parsed.path.split('/') if p]
+
+                try:
+                    if parsed.path == '/health':
+                        self._send(200, {'status': 'ok'})
+                    elif parsed.path == '/api/historical':
+                        self._send(200, server._profitPayload(query['search'][0]))
+                    elif parsed.path == SELIC_PATH:
+                        start = pd.to_datetime(query['dataInicial'][0], format='%d/%m/%Y') if 'dataInicial' in query else None
+                        end = pd.to_datetime(query['dataFinal'][0], format='%d/%m/%Y') if 'dataFinal' in query else None
+                        self._send(200, server._selicPayload(start, end))
+                    elif len(parts) == 2 and parts[0] in ('prices', 'lpa'):
+                        start = query.get('start', [None])[0]
+                        end = query.get('end', [None])[0]
+                        df = readFixture(server.fixtureDir, 'price' if parts[0] == 'prices' else 'lpa', parts[1])
+                        if parts[0] == 'prices':
+                            df = filterDates(df[[c for c in PRICE_COLUMNS if c in df.columns]], 'Date', start, end)
+                        else:
+                            df = filterYears(df, 'year', start, end)
+                        self._send(200, json.loads(df.to_json(orient='records', date_format='iso')))
+                    else:
+                        self._send(404, {'error': f'Unknown path {parsed.path}'})
+                except (FileNotFoundError, KeyError) as e:
+                    self._send(404, {'error': str(e)})
+
+        return ReplayHandler
+
+    def _profitPayload(self, ticker: str) -> Dict:
+        """Stocks API /api/historical response for a ticker"""
+        df = readFixture(self.fixtureDir, 'profit', ticker)
+        record = {'TICKER': ticker}
+        for _, row in df.iterrows():
+            record[f'LUCRO LIQUIDO {int(row["ANO"])}'] = float(row['LUCRO LIQUIDO'])
+        return {'data': [record]}
+
+    def _selicPayload(self, start=None, end=None) -> List[Dict]:
+        """BCB SGS response (dd/mm/YYYY dates, string values)"""
+        df = filterDates(readFixture(self.fixtureDir, 'selic'), 'data', start, end)
+        return [
+            {'data': date.strftime('%d/%m/%Y'), 'valor': str(valor)}
+            for date, valor in zip(df['data'], df['valor'])
+        ]
+
+class HTTPReplayProvider(DataProvider):
+    def __init__(self, baseUrl: str):
+        """
+        Provider reading prices and LPA from a ReplayServer
+
+        Profits and SELIC go through the regular StocksAPIProvider and
+        BCBProvider pointed at the stand-in, see useReplayServer()
+
+        Args:
+            baseUrl: ReplayServer URL
+        """
+        self.baseUrl = baseUrl
+
+    def _getRecords(self, path: str, start=None, end=None) -> pd.DataFrame:
+        bounds = {k: pd.Timestamp(v).strftime('%Y-%m-%d') for k, v in (('start', start), ('end', end)) if v is not None}
+        query = f'?{urlencode(bounds)}' if bounds else ''
+
+        with urlopen(f'{self.baseUrl}{path}{query}') as response:
+            return pd.DataFrame(json.loads(response.read()))
+
+    def getPrices(self, ticker: str, start=None, end=None) -> pd.DataFrame:
+        df = self._getRecords(f'/prices/{ticker}', start, end)
+        if not df.empty:
+            df['Date'] = pd.to_datetime(df['Date'])
+        return df
+
+    def getLPA(self, ticker: str, start=None, end=None) -> pd.DataFrame:
+        return self._getRecords(f'/lpa/{ticker}', start, end)
+
+def useReplay(fixtureDir: str = DEFAULT_FIXTURE_DIR, latency: float = 0.0) -> None:
+    """Route every data kind to an in-process ReplayProvider"""
+    provider = ReplayProvider(fixtureDir, latency)
+    for kind in FIXTURE_FILES:
+        setProvider(kind, provider)
+
+def useReplayServer(server: ReplayServer) -> None:
+    """Route every data kind through a running ReplayServer over HTTP"""
+    httpProvider = HTTPReplayProvider(server.url)
+    setProvider('price', httpProvider)
+    setProvider('lpa', httpProvider)
+    setProvider('profit', StocksAPIProvider(server.url))
+    setProvider('selic', BCBProvider(f'{server.url}{SELIC_PATH}?formato=json'))
+
+def useRecording(fixtureDir: str = DEFAULT_FIXTURE_DIR) -> None:
+    """Wrap the active providers so every response is recorded as a fixture"""
+    recorder = RecordingProvider(fixtureDir)
+    for kind in FIXTURE_FILES:
+        setProvider(kind, recorder)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Record or replay market data fixtures')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    record = sub.add_parser('record', help='Fetch live data and save it as fixtures')
+    record.add_argument('tickers', nargs='+')
+    record.add_argument('--dir', default=DEFAULT_FIXTURE_DIR)
+
+    serve = sub.add_parser('serve', help='Serve fixtures through the local HTTP stand-in')
+    serve.add_argument('--dir', default=DEFAULT_FIXTURE_DIR)
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=3200)
+    serve.add_argument('--latency', type=float, default=0.0, help='Delay per request (seconds)')
+
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        recorder = RecordingProvider(args.dir)
+        recorder.getSelic()
+        for ticker in args.tickers:
+            recorder.getPrices(ticker)
+            recorder.getLPA(ticker)
+            recorder.getProfits(ticker)
+            print(f'{ticker:6} | recorded')
+    else:
+        server = ReplayServer(args.dir, args.host, args.port, args.latency)
+        print(f'Replaying {args.dir} on {server.url} (latency {args.latency * 1000:.0f}ms)')
+        try:
+            server.httpd.serve_forever()
+        except KeyboardInterrupt:
+            server.httpd.server_close()
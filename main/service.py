@@ -0,0 +1,445 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from imports import *
+from economics import *
+from providers import getProvider
+from backtesting import getPriceData, getLPAData, getProfitData, MIN_CASH_FOR_BUY
+
+import economics
+import socketserver
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+DEFAULT_PORT = 3300
+LATENCY_WINDOW = 10000  # Requests kept for latency percentiles
+THROUGHPUT_WINDOW = 60  # Seconds used for the recent throughput figure
+
+class SignalService:
+    def __init__(self, tickers: List[str], safetyMargin: float = 0.50, maxWorkers: int = 4):
+        """
+        Resident signal service keeping market data and IV tables warm
+
+        Loads prices, LPA, profits and SELIC once, then answers "what should
+        this portfolio buy or sell today" from the latest snapshot using the
+        same rules as Backtester (signal zones, partial sell levels and
+        capped WPP allocation)
+
+        Args:
+            tickers: Initial universe, other tickers are loaded on first query
+            safetyMargin: Safety margin as decimal (0.50 = 50%)
+            maxWorkers: Concurrent fetches when loading or refreshing
+        """
+        self.safetyMargin = safetyMargin
+        self.maxWorkers = maxWorkers
+        self.lock = threading.RLock()
+
+        self.priceData: Dict[str, pd.DataFrame] = {}
+        self.lpaData: Dict[str, pd.DataFrame] = {}
+        self.profitData: Dict[str, pd.DataFrame] = {}
+        self.ivTable: Dict[str, Tuple[pd.Timestamp, Optional[float]]] = {}
+
+        self.startedAt = time.time()
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.requestTimes = deque()
+        self.requestCount = 0
+
+        if economics.selicDf is None:
+            loadSelicData()
+        self._load(tickers)
+
+    def _fetch(self, tickers: List[str]) -> Dict[str, Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]]:
+        """
+        Fetch prices, LPA and profits of tickers
+        
+        Network I/O (and selenium for LPA), never call it while holding the lock
+        
+        Returns:
+            Dict mapping ticker -> (price, lpa, profit)
+        """
+        with ThreadPoolExecutor(max_workers=self.maxWorkers) as pool:
+            prices = list(pool.map(getPriceData, tickers))
+            lpas = list(pool.map(getLPAData, tickers))
+            profits = list(pool.map(getProfitData, tickers))
+        
+        return dict(zip(tickers, zip(prices, lpas, profits)))
+    
+    def _load(self, tickers: List[str]) -> None:
+        """Fetch all data for tickers not loaded yet, other queries keep being served meanwhile"""
+        with self.lock:
+            missing = [t for t in tickers if t not in self.priceData]
+        if not missing:
+            return
+        
+        fetched = self._fetch(missing)
+        
+        with self.lock:
+            for ticker, (price, lpa, profit) in fetched.items():
+                # Another query may have loaded it in the meantime
+                if ticker in self.priceData:
+                    continue
+                
+                self.priceData[ticker] = price
+                self.lpaData[ticker] = lpa
+                self.profitData[ticker] = profit
+                self._updateIV(ticker)
+    
+    def _updateIV(self, ticker: str) -> None:
+        """Recompute the IV of a ticker if its last price date changed"""
+        priceDf = self.priceData[ticker]
+        if priceDf.empty:
+            self.ivTable[ticker] = (None, None)
+            return
+
+        lastDate = priceDf['Date'].iloc[-1]
+        if self.ivTable.get(ticker, (None, None))[0] != lastDate:
+            self.ivTable[ticker] = (lastDate, calculateIntrinsicValue(ticker, lastDate, self.profitData, self.lpaData))
+
+    def refresh(self) -> Dict[str, int]:
+        """
+        Refresh prices and SELIC, only fetching from the last loaded date on
+        
+        When a ticker's prices reach a new year, its LPA and profits are
+        fetched again, since the IV uses the LPA of the current year and the
+        profits up to the previous one
+        
+        IVs are recomputed only for tickers that got new prices, or for all of
+        them when the SELIC series changed
+        
+        Returns:
+            Dict mapping ticker -> number of new price rows
+        """
+        with self.lock:
+            tickers = list(self.priceData)
+            previousSelic = economics.selicDf
+            
+            lastDates = {t: self.priceData[t]['Date'].iloc[-1] if not self.priceData[t].empty else None for t in tickers}
+        
+        # Only ask each source for the days after what is already loaded
+        with ThreadPoolExecutor(max_workers=self.maxWorkers) as pool:
+            fetched = dict(zip(tickers, pool.map(lambda t: getPriceData(t, lastDates[t]), tickers)))
+            
+            rolled = [
+                t for t in tickers
+                if not fetched[t].empty and (lastDates[t] is None or fetched[t]['Date'].iloc[-1].year != lastDates[t].year)
+            ]
+            lpas = dict(zip(rolled, pool.map(getLPAData, rolled)))
+            profits = dict(zip(rolled, pool.map(getProfitData, rolled)))
+        
+        # SELIC is only fetched from its last loaded date, which BCB may still revise
+        lastSelicDate = previousSelic['data'].iloc[-1] if previousSelic is not None and len(previousSelic) > 0 else None
+        newSelic = getProvider('selic').getSelic(lastSelicDate)
+        
+        with self.lock:
+            if lastSelicDate is None:
+                selicChanged = True
+            elif newSelic.empty:
+                selicChanged = False
+            else:
+                loadedTail = previousSelic[previousSelic['data'] >= lastSelicDate].reset_index(drop=True)
+                newSelic = newSelic[newSelic['data'] >= lastSelicDate].reset_index(drop=True)
+                selicChanged = not newSelic.equals(loadedTail)
+                newSelic = pd.concat([previousSelic[previousSelic['data'] < lastSelicDate], newSelic], ignore_index=True)
+            
+            if selicChanged:
+                setSelicData(newSelic)
+                self.ivTable.clear()
+            
+            for ticker in rolled:
+                self.lpaData[ticker] = lpas[ticker]
+                self.profitData[ticker] = profits[ticker]
+            
+            # Tickers loaded by a concurrent query during the fetch lost their IV in the clear too
+            if selicChanged:
+                for ticker in self.priceData:
+                    if ticker not in fetched:
+                        self._updateIV(ticker)
+            
+            added = {}
+            for ticker, df in fetched.items():
+                current = self.priceData[ticker]
+                lastDate = current['Date'].iloc[-1] if not current.empty else pd.Timestamp.min
+                newRows = df[df['Date'] > lastDate] if not df.empty else df
+                
+                added[ticker] = len(newRows)
+                if len(newRows) > 0:
+                    self.priceData[ticker] = pd.concat([current, newRows], ignore_index=True)
+                
+                if selicChanged or len(newRows) > 0 or ticker in lpas:
+                    self._updateIV(ticker)
+            
+            return added
+    
+    def _snapshot(self, tickers: List[str]) -> Tuple[np.ndarray, np.ndarray, List[Optional[pd.Timestamp]]]:
+        """
+        Latest prices and IVs of tickers, loading the unknown ones first
+        
+        Returns:
+            (prices, ivs, IV dates), NaN where unavailable
+        """
+        self._load(tickers)
+        
+        with self.lock:
+            for t in tickers:
+                if t not in self.ivTable:
+                    self._updateIV(t)
+            
+            prices = np.array([self.priceData[t]['Close'].iloc[-1] if not self.priceData[t].empty else np.nan for t in tickers], dtype=float)
+            ivs = np.array([self.ivTable[t][1] if self.ivTable[t][1] is not None else np.nan for t in tickers], dtype=float)
+            dates = [self.ivTable[t][0] for t in tickers]
+        
+        return prices, ivs, dates
+    
+    def signals(self, portfolio: List[Dict], positions: Optional[Dict[str, int]] = None, cash: float = 0) -> Dict:
+        """
+        Today's actions for a portfolio
+
+        Args:
+            portfolio: [{'TICKER': str, 'WEIGHT': float}, ...]
+            positions: {ticker: shares held}
+            cash: Available cash
+
+        Returns:
+            {'date', 'signals': {ticker: {...}}, 'sells': {ticker: shares},
+             'buys': {ticker: {'shares', 'allocation'}}, 'cash_after'}
+        """
+        positions = positions or {}
+        tickers = [p['TICKER'] for p in portfolio]
+        weights = np.array([p['WEIGHT'] for p in portfolio], dtype=float)
+
+        prices, ivs, dates = self._snapshot(tickers)
+
+        table = buildSignalTable(ivs, prices, weights, self.safetyMargin)
+        held = np.array([positions.get(t, 0) for t in tickers], dtype=float)
+
+        sellZone, buyZone = calculateSignalZones(table)
+
+        sells = {}
+        for j in np.flatnonzero(sellZone & (held > 0) & (table['level'] >= 0)):
+            shares = int(held[j] * PROFIT_MARGIN_THRESHOLDS[table['level'][j]][2])
+            if shares > 0:
+                sells[tickers[j]] = shares
+                cash += shares * prices[j]
+                held[j] -= shares
+
+        buys = {}
+        buySignals = {
+            tickers[j]: {'iv': ivs[j], 'price': prices[j], 'wpp': float(table['wpp'][j])}
+            for j in np.flatnonzero(buyZone & (table['wpp'] > 0))
+            if cash > prices[j] * MIN_CASH_FOR_BUY
+        }
+        if buySignals:
+            positionValues = np.nan_to_num(held * prices, nan=0.0)
+            maxInvestment = calculateMaxInvestment(weights, positionValues, cash + positionValues.sum())
+            allocations = allocateCapitalByWPP(buySignals, cash, dict(zip(tickers, maxInvestment.tolist())))
+
+            for ticker, amount in allocations.items():
+                price = buySignals[ticker]['price']
+                shares = int(amount / price)
+                if shares > 0 and cash >= shares * price:
+                    buys[ticker] = {'shares': shares, 'allocation': round(amount, 2)}
+                    cash -= shares * price
+
+        signalNames = {SIGNAL_BUY: 'BUY', SIGNAL_HOLD: 'HOLD', SIGNAL_SELL: 'SELL'}
+        return {
+            'date': max((d for d in dates if d is not None), default=None),
+            'signals': {
+                ticker: {
+                    'signal': signalNames[int(table['signal'][j])],
+                    'price': None if np.isnan(prices[j]) else round(float(prices[j]), 2),
+                    'iv': None if np.isnan(ivs[j]) else float(ivs[j]),
+                    'buy_price': None if np.isnan(table['buy_price'][j]) else float(table['buy_price'][j]),
+                    'sell_price': None if np.isnan(table['sell_price'][j]) else float(table['sell_price'][j]),
+                    'level': int(table['level'][j]) + 1 if table['level'][j] >= 0 else None,
+                    'wpp': float(table['wpp'][j]),
+                }
+                for j, ticker in enumerate(tickers)
+            },
+            'sells': sells,
+            'buys': buys,
+            'cash_after': round(float(cash), 2),
+        }
+
+    def raiseCash(self, portfolio: List[Dict], positions: Dict[str, int], targetCash: float) -> Dict:
+        """
+        Shares to sell to raise a target amount of cash (e.g. a withdrawal)
+        
+        Uses the Proportional Liquidation Distribution: overvalued stocks
+        with a low strategic weight are sold first (see liquidateByWSF)
+        
+        Args:
+            portfolio: [{'TICKER': str, 'WEIGHT': float}, ...]
+            positions: {ticker: shares held}
+            targetCash: Cash to raise
+        
+        Returns:
+            {'date', 'sells': {ticker: shares}, 'cash_raised', 'shortfall'}
+        """
+        tickers = [p['TICKER'] for p in portfolio]
+        weights = np.array([p['WEIGHT'] for p in portfolio], dtype=float)
+        held = np.array([positions.get(t, 0) for t in tickers], dtype=float)
+        
+        prices, ivs, dates = self._snapshot(tickers)
+        
+        # Stocks without a price can't be sold today
+        held = np.where(np.isnan(prices), 0.0, held)
+        shares = liquidateByWSF(ivs, np.nan_to_num(prices, nan=0.0), weights, held, targetCash)
+        raised = float((shares * np.nan_to_num(prices, nan=0.0)).sum())
+        
+        return {
+            'date': max((d for d in dates if d is not None), default=None),
+            'sells': {tickers[j]: int(shares[j]) for j in np.flatnonzero(shares > 0)},
+            'cash_raised': round(raised, 2),
+            'shortfall': round(max(targetCash - raised, 0.0), 2),
+        }
+    
+    def recordRequest(self, seconds: float) -> None:
+        """Track a served request for the latency and throughput metrics"""
+        now = time.time()
+        with self.lock:
+            self.requestCount += 1
+            self.latencies.append(seconds * 1000)
+            self.requestTimes.append(now)
+            while self.requestTimes and self.requestTimes[0] < now - THROUGHPUT_WINDOW:
+                self.requestTimes.popleft()
+
+    def metrics(self) -> Dict:
+        """Latency percentiles (ms) and throughput (requests/s)"""
+        with self.lock:
+            latencies = np.array(self.latencies) if self.latencies else np.zeros(1)
+            uptime = time.time() - self.startedAt
+            return {
+                'requests': self.requestCount,
+                'uptime_s': round(uptime, 1),
+                'tickers_loaded': len(self.priceData),
+                'latency_ms': {
+                    'p50': round(float(np.percentile(latencies, 50)), 3),
+                    'p95': round(float(np.percentile(latencies, 95)), 3),
+                    'p99': round(float(np.percentile(latencies, 99)), 3),
+                    'max': round(float(latencies.max()), 3),
+                },
+                'throughput_rps': {
+                    'overall': round(self.requestCount / uptime, 2) if uptime > 0 else 0,
+                    f'last_{THROUGHPUT_WINDOW}s': round(len(self.requestTimes) / THROUGHPUT_WINDOW, 2),
+                },
+            }
+
+def makeHandler(service: SignalService):
+    """
+    HTTP handler exposing the service:
+        GET  /health
+        GET  /metrics
+        POST /signals   {"portfolio": [{"TICKER", "WEIGHT"}], "positions": {...}, "cash": float}
+        POST /liquidate {"portfolio": [{"TICKER", "WEIGHT"}], "positions": {...}, "target_cash": float}
+        POST /refresh
+    """
+
+    class SignalHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, payload) -> None:
+            body = json.dumps(payload, default=str).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _readJson(self) -> Dict:
+            length = int(self.headers.get('Content-Length', 0))
+            return json.loads(self.rfile.read(length)) if length else {}
+
+        def do_GET(self):
+            if self.path == '/health':
+                self._send(200, {'status': 'ok'})
+            elif self.path == '/metrics':
+                self._send(200, service.metrics())
+            else:
+                self._send(404, {'error': f'Unknown path {self.path}'})
+
+        def do_POST(self):
+            start = time.perf_counter()
+            try:
+                if self.path == '/signals':
+                    body = self._readJson()
+                    self._send(200, service.signals(body['portfolio'], body.get('positions'), body.get('cash', 0)))
+                elif self.path == '/liquidate':
+                    body = self._readJson()
+                    self._send(200, service.raiseCash(body['portfolio'], body.get('positions') or {}, float(body['target_cash'])))
+                elif self.path == '/refresh':
+                    self._send(200, {'new_rows': service.refresh()})
+                else:
+                    self._send(404, {'error': f'Unknown path {self.path}'})
+                    return
+            except (KeyError, ValueError, TypeError) as e:
+                self._send(400, {'error': str(e)})
+            except Exception as e:
+                # e.g. a data source failing while loading a new ticker
+                self._send(500, {'error': f'{type(e).__name__}: {e}'})
+            service.recordRequest(time.perf_counter() - start)
+
+        def address_string(self):
+            # Unix socket clients have no (host, port) address
+            return self.client_address[0] if self.client_address else 'unix'
+
+    return SignalHandler
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def serve(service: SignalService, host: str = '127.0.0.1', port: int = DEFAULT_PORT, unixSocket: Optional[str] = None):
+    """
+    Build the HTTP server for a service (call serve_forever() on the result)
+
+    Args:
+        service: Loaded SignalService
+        host, port: TCP address, ignored when unixSocket is given
+        unixSocket: Path of a Unix socket to listen on instead of TCP
+
+    Returns:
+        Server instance
+    """
+    handler = makeHandler(service)
+
+    if unixSocket:
+        if os.path.exists(unixSocket):
+            os.remove(unixSocket)
+        return ThreadingUnixHTTPServer(unixSocket, handler)
+
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Resident signal service')
+    parser.add_argument('tickers', nargs='+')
+    parser.add_argument('--safety-margin', type=float, default=0.50)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--unix-socket')
+    parser.add_argument('--refresh-every', type=float, default=0, help='Seconds between background refreshes (0 = off)')
+    args = parser.parse_args()
+
+    service = SignalService(args.tickers, args.safety_margin)
+
+    if args.refresh_every > 0:
+        def refreshLoop():
+            while True:
+                time.sleep(args.refresh_every)
+                try:
+                    service.refresh()
+                except Exception as e:
+                    print(f'Refresh failed: {e}')
+        threading.Thread(target=refreshLoop, daemon=True).start()
+
+    server = serve(service, args.host, args.port, args.unix_socket)
+    print(f"Signal service ready ({len(args.tickers)} tickers) on {args.unix_socket or f'http://{args.host}:{args.port}'}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()